@@ -0,0 +1,45 @@
+import json
+import os
+from threading import Lock
+
+
+class CatalogStore:
+    """Resident copy of catalog.json, indexed by book id and case-folded topic.
+
+    The file is parsed once at startup; reads are served from memory and
+    writes update the in-memory records before being persisted.
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.write_lock = Lock()
+        self.books = {}
+        self.topic_index = {}
+        self.load()
+
+    def load(self):
+        with open(self.data_file, 'r') as f:
+            self.replace(json.load(f))
+
+    def replace(self, catalog):
+        books = {book["id"]: book for book in catalog}
+        topic_index = {}
+        for book in catalog:
+            topic_index.setdefault(book["topic"].casefold(), []).append(book["id"])
+        self.books, self.topic_index = books, topic_index
+
+    def snapshot(self):
+        return [dict(book) for book in self.books.values()]
+
+    def persist(self):
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(list(self.books.values()), f, indent=2)
+        os.replace(tmp_file, self.data_file)
+
+    def get(self, book_id):
+        return self.books.get(book_id)
+
+    def search(self, topic):
+        books = self.books
+        return [books[book_id] for book_id in self.topic_index.get(topic.casefold(), ())]
@@ -0,0 +1,88 @@
+"""
+Cache policy benchmark for Lab 2
+Replays a frontend access trace against each cache policy and compares hit rates
+
+Usage:
+    docker-compose logs --no-color frontend-service > frontend.log
+    python bench_cache_policy.py frontend.log
+
+Without a log file a synthetic trace is used: a skewed mix of hot search
+and info keys interrupted by periodic scans over cold info ids.
+"""
+import os
+import random
+import re
+import sys
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'frontend-service'))
+
+from cache import POLICIES, SegmentedCache
+
+CACHE_SIZES = [50, 100, 200]
+CACHE_SEGMENTS = 16
+LOG_PATTERN = re.compile(r"Cache (?:HIT|MISS) for key: (.+)$")
+
+TOPICS = ["distributed systems", "undergraduate school", "project management", "education", "nature"]
+
+
+def load_trace(path):
+    trace = []
+    with open(path, 'r') as f:
+        for line in f:
+            match = LOG_PATTERN.search(line.rstrip())
+            if match:
+                trace.append(match.group(1))
+    return trace
+
+
+def synthetic_trace(requests=200000, catalog_size=5000, scan_every=5000, scan_length=400, seed=7):
+    rng = random.Random(seed)
+    book_ids = list(range(1, catalog_size + 1))
+    cum_weights = list(accumulate(1 / (rank ** 1.1) for rank in book_ids))
+    trace = []
+    next_scan = scan_every
+    while len(trace) < requests:
+        if len(trace) >= next_scan:
+            next_scan += scan_every
+            start = rng.randint(1, catalog_size - scan_length)
+            trace.extend(f"info:{book_id}" for book_id in range(start, start + scan_length))
+        if rng.random() < 0.3:
+            trace.append(f"search:{rng.choice(TOPICS)}")
+        else:
+            trace.append(f"info:{rng.choices(book_ids, cum_weights=cum_weights)[0]}")
+    return trace
+
+
+def replay(trace, policy, size):
+    cache = SegmentedCache(size, CACHE_SEGMENTS, policy)
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+    stats = cache.stats()
+    return stats['hits'] / max(stats['hits'] + stats['misses'], 1) * 100
+
+
+def main():
+    if len(sys.argv) > 1:
+        trace = load_trace(sys.argv[1])
+        source = sys.argv[1]
+    else:
+        trace = synthetic_trace()
+        source = "synthetic trace"
+
+    if not trace:
+        print(f"No cache accesses found in {source}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Cache policy hit rates on {source} ({len(trace)} requests, {len(set(trace))} keys)")
+    print("=" * 60)
+    print(f"{'Size':>6} " + " ".join(f"{policy:>10}" for policy in POLICIES))
+    for size in CACHE_SIZES:
+        rates = [replay(trace, policy, size) for policy in POLICIES]
+        print(f"{size:>6} " + " ".join(f"{rate:>9.2f}%" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
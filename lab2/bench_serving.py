@@ -0,0 +1,90 @@
+"""
+Serving benchmark for Lab 2
+Measures frontend throughput and latency under concurrent keep-alive clients
+
+Usage:
+    python bench_serving.py [base_url] [clients] [seconds]
+
+Run it once with the services on the Flask development server
+(`python app.py`) and once on gunicorn (`gunicorn app:app`, the Docker
+default) to compare. Every client keeps one session open and loops over a
+mix of info and search reads, most of which the frontend serves from cache.
+"""
+import random
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+BASE_URL = "http://localhost:9000"
+CLIENTS = 32
+SECONDS = 20
+WARMUP_SECONDS = 2
+
+BOOK_IDS = list(range(1, 8))
+TOPICS = ["distributed systems", "undergraduate school"]
+
+
+def client(base_url, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        if rng.random() < 0.8:
+            path = f"/info/{rng.choice(BOOK_IDS)}"
+        else:
+            path = f"/search/{rng.choice(TOPICS)}"
+        start = time.monotonic()
+        try:
+            ok = session.get(f"{base_url}{path}", timeout=10).status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(path)
+
+
+def run(base_url, clients, seconds):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(target=client, args=(base_url, deadline, latencies, errors, seed))
+        for seed in range(clients)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+
+def percentile(samples, percent):
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else BASE_URL
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else CLIENTS
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else SECONDS
+
+    # Fill the cache and open connections before measuring
+    run(base_url, clients, WARMUP_SECONDS)
+    latencies, errors, elapsed = run(base_url, clients, seconds)
+    if not latencies:
+        print(f"No successful requests to {base_url} ({len(errors)} errors)")
+        return
+
+    latencies.sort()
+    print(f"{base_url}: {clients} clients for {elapsed:.1f}s")
+    print(f"{'requests':>10} {'errors':>8} {'req/s':>9} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print(f"{len(latencies):>10} {len(errors):>8} {len(latencies) / elapsed:>9.1f} "
+          f"{statistics.mean(latencies) * 1000:>9.2f} {percentile(latencies, 50) * 1000:>8.2f} "
+          f"{percentile(latencies, 95) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,83 @@
 from flask import Flask, jsonify, request
-from service import CatalogService
+import http_pool
+from service import WRITE_LOST, CatalogService
+import sync
 
 app = Flask(__name__)
+sync.start(CatalogService)
+
+
+def not_primary():
+    return jsonify({"success": False, "message": "Not the primary", "primary": sync.primary_url()}), 503
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        "success": True,
+        "data": {
+            "seq": CatalogService.current_seq(),
+            "role": "primary" if sync.is_primary() else "backup",
+            "primary": sync.primary_url()
+        }
+    }), 200
 
 
 @app.route('/search/<topic>', methods=['GET'])
 def search(topic):
-    results = CatalogService.search_by_topic(topic)
-    return jsonify({"success": True, "data": results}), 200
+    results, etag = CatalogService.search_by_topic(topic)
+    response = jsonify({"success": True, "data": results})
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route('/info/<int:book_id>', methods=['GET'])
 def info(book_id):
     book_info = CatalogService.get_book_info(book_id)
     if book_info:
-        return jsonify({"success": True, "data": book_info}), 200
+        response = jsonify({"success": True, "data": book_info})
+        response.set_etag(CatalogService.info_etag(book_id, book_info))
+        return response.make_conditional(request)
     else:
         return jsonify({"success": False, "message": "Book not found"}), 404
 
 
 @app.route('/decrement/<int:book_id>', methods=['POST'])
 def decrement(book_id):
+    if not sync.is_primary():
+        return not_primary()
     success, message = CatalogService.decrement_quantity(book_id)
     if success:
         return jsonify({"success": True, "message": message}), 200
     else:
         if "not found" in message:
             return jsonify({"success": False, "message": message}), 404
+        elif message == WRITE_LOST:
+            return jsonify({"success": False, "message": message}), 500
+        else:
+            return jsonify({"success": False, "message": message}), 400
+
+
+@app.route('/purchase/<int:book_id>', methods=['POST'])
+def purchase(book_id):
+    if not sync.is_primary():
+        return not_primary()
+    success, message, book_info = CatalogService.purchase(book_id)
+    if success:
+        return jsonify({"success": True, "message": message, "data": book_info}), 200
+    else:
+        if "not found" in message:
+            return jsonify({"success": False, "message": message}), 404
+        elif message == WRITE_LOST:
+            return jsonify({"success": False, "message": message}), 500
         else:
             return jsonify({"success": False, "message": message}), 400
 
 
 @app.route('/update/<int:book_id>/price', methods=['PUT'])
 def update_price(book_id):
+    if not sync.is_primary():
+        return not_primary()
     try:
         data = request.get_json()
         if not data or 'price' not in data:
@@ -48,6 +93,8 @@ def update_price(book_id):
         else:
             if "not found" in message:
                 return jsonify({"success": False, "message": message}), 404
+            elif message == WRITE_LOST:
+                return jsonify({"success": False, "message": message}), 500
             else:
                 return jsonify({"success": False, "message": message}), 400
     
@@ -57,6 +104,8 @@ def update_price(book_id):
 
 @app.route('/update/<int:book_id>/stock', methods=['PUT'])
 def update_stock(book_id):
+    if not sync.is_primary():
+        return not_primary()
     try:
         data = request.get_json()
         if not data or 'quantity_change' not in data:
@@ -72,6 +121,8 @@ def update_stock(book_id):
         else:
             if "not found" in message:
                 return jsonify({"success": False, "message": message}), 404
+            elif message == WRITE_LOST:
+                return jsonify({"success": False, "message": message}), 500
             else:
                 return jsonify({"success": False, "message": message}), 400
     
@@ -79,5 +130,80 @@ def update_stock(book_id):
         return jsonify({"success": False, "message": f"Invalid request: {str(e)}"}), 400
 
 
+@app.route('/sync', methods=['POST'])
+def sync_endpoint():
+    if sync.is_primary():
+        return jsonify({"success": False, "message": "The primary does not accept replicated writes"}), 409
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "message": "Missing request body"}), 400
+        
+        operation = data.get('operation')
+        book_id = data.get('book_id')
+        op_data = data.get('data')
+        seq = data.get('seq')
+        
+        if not all([operation, book_id is not None, op_data, seq is not None]):
+            return jsonify({"success": False, "message": "Missing required fields"}), 400
+        
+        success, message, applied_seq = sync.apply_sync(CatalogService, operation, book_id, op_data, seq)
+        
+        if success:
+            return jsonify({"success": True, "message": message, "applied_seq": applied_seq}), 200
+        else:
+            return jsonify({"success": False, "message": message}), 400
+    
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Sync error: {str(e)}"}), 500
+
+
+@app.route('/sync/batch', methods=['POST'])
+def sync_batch_endpoint():
+    if sync.is_primary():
+        return jsonify({"success": False, "message": "The primary does not accept replicated writes"}), 409
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('ops'), list):
+            return jsonify({"success": False, "message": "Missing 'ops' list in request body"}), 400
+        
+        success, message, applied_seq = sync.apply_batch(CatalogService, data['ops'])
+        
+        if success:
+            return jsonify({"success": True, "message": message, "applied_seq": applied_seq}), 200
+        else:
+            return jsonify({"success": False, "message": message}), 400
+    
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Sync error: {str(e)}"}), 500
+
+
+@app.route('/replication/log', methods=['GET'])
+def replication_log():
+    since = request.args.get('since', default=0, type=int)
+    snapshot = request.args.get('snapshot', default=0, type=int) == 1
+    return jsonify({"success": True, "data": sync.catch_up_payload(CatalogService, since, snapshot)}), 200
+
+
+@app.route('/replication/resync', methods=['POST'])
+def replication_resync():
+    if sync.is_primary():
+        return jsonify({"success": False, "message": "The primary does not resync from a peer"}), 409
+    sync.request_snapshot()
+    return jsonify({"success": True, "message": "Snapshot resync scheduled"}), 200
+
+
+@app.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify({"success": True, "data": http_pool.stats()}), 200
+
+
+@app.route('/replication-stats', methods=['GET'])
+def get_replication_stats():
+    stats = sync.replication_queue.stats()
+    stats["cache_updates"] = sync.cache_update_queue.stats()
+    return jsonify({"success": True, "data": stats}), 200
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080)
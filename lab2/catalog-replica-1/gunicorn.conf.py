@@ -0,0 +1,23 @@
+"""Gunicorn settings for the catalog replica: `gunicorn app:app` (see README)."""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = 'gthread'
+# The store, its per-book locks, the replication queue and the lease all live
+# in one process, so the catalog scales with threads, not workers
+workers = 1
+threads = int(os.getenv('WEB_THREADS', '16'))
+# Idle client connections stay open this many seconds for the next request
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+# On SIGTERM a worker stops accepting and finishes in-flight requests for up to this long
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '10'))
+# Each worker imports the app itself so its background threads run in the worker
+preload_app = False
+
+
+def worker_exit(server, worker):
+    # The replication queue is on disk, but pending frontend cache updates are not
+    import sync
+    if sync.cache_update_queue:
+        sync.cache_update_queue.drain(min(graceful_timeout, 5))
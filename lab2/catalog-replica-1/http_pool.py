@@ -0,0 +1,66 @@
+import os
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '5'))
+
+_sessions = {}
+_sessions_lock = Lock()
+
+
+def get_session(url):
+    """Return the keep-alive session shared by every call to `url`'s host."""
+    upstream = urlsplit(url).netloc
+    session = _sessions.get(upstream)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=POOL_BLOCK)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _sessions[upstream] = session
+    return session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', TIMEOUT)
+    return get_session(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def stats():
+    upstreams = {}
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+    for upstream, session in sessions:
+        pools = session.get_adapter('http://').poolmanager.pools
+        requests_sent = connections_opened = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        upstreams[upstream] = {
+            "requests": requests_sent,
+            "pool_hits": max(requests_sent - connections_opened, 0),
+            "pool_misses": connections_opened
+        }
+    return {"pool_size": POOL_SIZE, "pool_block": POOL_BLOCK, "timeout": TIMEOUT, "upstreams": upstreams}
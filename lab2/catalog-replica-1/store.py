@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+from contextlib import ExitStack, contextmanager
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_MODE = os.getenv('CATALOG_PERSISTENCE', 'wal')
+WAL_COMPACT_EVERY = int(os.getenv('CATALOG_WAL_COMPACT_EVERY', '1000'))
+LOCK_STRIPES = int(os.getenv('CATALOG_LOCK_STRIPES', '64'))
+
+
+class WriteAheadLog:
+    """Append-only JSON-lines log of catalog mutations with group fsync.
+
+    Writers append under the store's write lock; `sync` is called after the
+    lock is released so that one fsync covers every record appended so far.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a')
+        self.lock = Lock()
+        self.sync_lock = Lock()
+        self.records = 0
+        self.written_seq = 0
+        self.synced_seq = 0
+
+    def read(self):
+        records = []
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Dropping torn WAL tail in {self.path}")
+                    os.truncate(self.path, valid_bytes)
+                    break
+                valid_bytes += len(line)
+        self.records = len(records)
+        return records
+
+    def append(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self.records += 1
+            self.written_seq = record["seq"]
+
+    def sync(self, seq):
+        if self.synced_seq >= seq:
+            return
+        with self.sync_lock:
+            if self.synced_seq >= seq:
+                return
+            with self.lock:
+                self.file.flush()
+                target = self.written_seq
+            os.fsync(self.file.fileno())
+            self.synced_seq = target
+
+    def truncate(self):
+        with self.sync_lock, self.lock:
+            self.file.close()
+            self.file = open(self.path, 'w')
+            self.records = 0
+            self.synced_seq = self.written_seq
+
+
+class CatalogStore:
+    """Resident copy of catalog.json, indexed by book id and case-folded topic.
+
+    The file is parsed once at startup; reads are served from memory and
+    writes update the in-memory records before being persisted. In 'wal'
+    mode each mutation is a single append to catalog.wal and catalog.json
+    is only rewritten when the log is compacted. Every book carries the
+    sequence number of the last mutation applied to it (its version), so
+    a record is applied only if it is newer than the book: replaying a log
+    that outlived its snapshot, or a retried replication batch, is a no-op.
+
+    Locking: a read-modify-write on one book holds that book's stripe from
+    `lock_for` for the whole check-and-update, so purchases of different
+    books don't contend while purchases of the same book are linearizable.
+    `write_lock` is held only briefly inside it, to allocate the seq and
+    append to the log in seq order. Always take a stripe before `write_lock`.
+    """
+
+    def __init__(self, data_file, mode=PERSISTENCE_MODE, stripes=LOCK_STRIPES):
+        self.data_file = data_file
+        self.stripes = [Lock() for _ in range(stripes)]
+        self.write_lock = Lock()
+        self.books = {}
+        self.topic_index = {}
+        self.seq = 0
+        self.replayed = []
+        self.wal = WriteAheadLog(f"{os.path.splitext(data_file)[0]}.wal") if mode == 'wal' else None
+        self.load()
+
+    def load(self):
+        with open(self.data_file, 'r') as f:
+            self.replace(json.load(f))
+        if self.wal:
+            # Keep each replayed record with the book's state right after it
+            self.replayed = [
+                (record, dict(self.books[record["book_id"]]))
+                for record in self.wal.read() if self.apply_record(record)
+            ]
+            if self.replayed:
+                logger.info(f"Replayed {len(self.replayed)} WAL records up to seq {self.seq}")
+            self.wal.written_seq = self.wal.synced_seq = self.seq
+
+    def replace(self, catalog, seq=None):
+        """Swap in a whole catalog; `seq` resets the log position (e.g. to a
+        primary's snapshot), otherwise it only moves forward."""
+        books = {book["id"]: book for book in catalog}
+        topic_index = {}
+        for book in catalog:
+            topic_index.setdefault(book["topic"].casefold(), []).append(book["id"])
+        self.books, self.topic_index = books, topic_index
+        if seq is None:
+            seq = max([self.seq] + [book.get("seq", 0) for book in catalog])
+        self.seq = seq
+
+    def advance(self, seq):
+        """Let the next mutation start after `seq`; the caller must hold `write_lock`."""
+        self.seq = max(self.seq, seq)
+
+    def snapshot(self):
+        return [dict(book) for book in self.books.values()]
+
+    def persist(self):
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(list(self.books.values()), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        if self.wal:
+            self.wal.truncate()
+
+    def lock_for(self, book_id):
+        return self.stripes[hash(book_id) % len(self.stripes)]
+
+    @contextmanager
+    def exclusive(self):
+        """Hold every stripe and `write_lock`, for changes spanning many books."""
+        with ExitStack() as stack:
+            for lock in self.stripes:
+                stack.enter_context(lock)
+            stack.enter_context(self.write_lock)
+            yield
+
+    def get(self, book_id):
+        return self.books.get(book_id)
+
+    def search(self, topic):
+        books = self.books
+        return [books[book_id] for book_id in self.topic_index.get(topic.casefold(), ())]
+
+    def apply_record(self, record):
+        book = self.books.get(record["book_id"])
+        if book is None or book.get("seq", 0) >= record["seq"]:
+            return False
+        if "delta" in record:
+            book["quantity"] += record["delta"]
+        if "quantity" in record:
+            book["quantity"] = record["quantity"]
+        if "price" in record:
+            book["price"] = record["price"]
+        book["seq"] = record["seq"]
+        self.seq = max(self.seq, record["seq"])
+        return True
+
+    def mutate(self, op, book_id, delta=None, price=None):
+        """Apply and log one mutation; the caller must hold `write_lock`."""
+        record = {"seq": self.seq + 1, "op": op, "book_id": book_id}
+        if price is not None:
+            record["price"] = price
+        else:
+            record["delta"] = delta
+        self.log([record])
+        return record["seq"]
+
+    def log(self, records):
+        """Apply records and persist them as one unit; the caller must hold
+        `write_lock`. Records already reflected in the store are skipped.
+        Returns the records that were applied."""
+        applied = [record for record in records if self.apply_record(record)]
+        if not applied:
+            return applied
+        
+        if self.wal is None:
+            self.persist()
+            return applied
+        
+        for record in applied:
+            self.wal.append(record)
+        if self.wal.records >= WAL_COMPACT_EVERY:
+            self.persist()
+            logger.info(f"Compacted WAL into snapshot at seq {self.seq}")
+        return applied
+
+    def commit(self, seq):
+        """Block until the mutation with `seq` is durable (group fsync)."""
+        if self.wal:
+            self.wal.sync(seq)
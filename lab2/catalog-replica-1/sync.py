@@ -1,70 +1,615 @@
 import requests
+import base64
+import gzip
+import json
 import logging
+import http_pool
 import os
-from time import sleep
+from collections import OrderedDict, deque
+from itertools import islice
+from threading import Condition, Event, Lock, Thread
+from time import monotonic, sleep, time
+import lease
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-REPLICA_2_URL = os.getenv('CATALOG_REPLICA_2_URL', 'http://catalog-replica-2:8082')
+# This node and the other catalog replica; replica-1 is the preferred primary
+NODE_ID = os.getenv('CATALOG_NODE_ID', 'catalog-replica-1')
+SELF_URL = os.getenv('CATALOG_SELF_URL', 'http://catalog-replica-1:8080')
+PEER_URL = os.getenv('CATALOG_REPLICA_2_URL', 'http://catalog-replica-2:8082')
+STANDBY = False
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://frontend-service:80')
-MAX_RETRIES = 3
+QUEUE_FILE = os.path.join(os.path.dirname(__file__), 'data', 'replication.queue')
+BATCH_SIZE = int(os.getenv('REPLICATION_BATCH_SIZE', '50'))
+LOG_RETENTION = int(os.getenv('REPLICATION_LOG_RETENTION', '10000'))
+CATCH_UP_INTERVAL = float(os.getenv('CATALOG_CATCH_UP_INTERVAL', '30'))
+# A seq is (term << TERM_BITS) + position in the term; every new primary starts a new term
+TERM_BITS = 32
+# Opt-in: how long a write waits for the backup to apply it before it is
+# answered anyway. 0 (the default) answers writes without waiting.
+REPLICATION_ACK_TIMEOUT = float(os.getenv('REPLICATION_ACK_TIMEOUT', '0'))
+CACHE_UPDATE_BATCH_SIZE = int(os.getenv('CACHE_UPDATE_BATCH_SIZE', '100'))
+CACHE_UPDATE_LINGER = float(os.getenv('CACHE_UPDATE_LINGER', '0.01'))
 RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 10
 
 
-def propagate_write(operation, book_id, data):
-    payload = {
-        'operation': operation,
-        'book_id': book_id,
-        'data': data
-    }
-    
-    for attempt in range(MAX_RETRIES):
+class ReplicationQueue:
+    """Durable outbound queue of catalog writes, drained to the backup in order.
+
+    Entries are appended to a spool file, and `sync` fsyncs it before the
+    client is answered; as with the WAL, one fsync covers every entry
+    appended so far. A background worker ships entries by ascending seq and
+    retries connection errors and 5xx with capped backoff. A batch the
+    backup rejects with a 4xx will be rejected again, so it is moved to the
+    dead-letter file (`<spool>.dead`) and the backup is asked to resync from
+    a snapshot instead. The spool is truncated once fully acked.
+
+    With REPLICATION_ACK_TIMEOUT set, writers wait in `wait_acked` until the
+    backup has applied their write.
+    If it does not within the timeout, the queue stops waiting (`lagging`)
+    until the backup has caught up, so a dead backup costs one timeout and
+    not one per write. Only a primary that loses its lease discards what is
+    left (`discard`), after appending it to `<spool>.discarded`.
+    """
+
+    def __init__(self, queue_file):
+        self.queue_file = queue_file
+        self.ack_file = f"{queue_file}.ack"
+        self.dead_letter_file = f"{queue_file}.dead"
+        self.discarded_file = f"{queue_file}.discarded"
+        self.lock = Lock()
+        self.cond = Condition(self.lock)
+        self.acked = Condition(self.lock)
+        self.lagging = False
+        self.discarded_seqs = (0, 0)
+        self.sync_lock = Lock()
+        self.dead_lettered = 0
+        self.pending = deque()
+        self.generation = 0
+        self.acked_seq = self._read_ack()
+        self.enqueued_seq = self.acked_seq
+        
+        if os.path.exists(queue_file):
+            with open(queue_file, 'r') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    entry = json.loads(line)
+                    if entry['seq'] > self.acked_seq:
+                        self.pending.append(entry)
+                        self.enqueued_seq = entry['seq']
+            if self.pending:
+                logger.info(f"Recovered {len(self.pending)} unreplicated writes from {queue_file}")
+        self._rewrite_spool()
+        self.synced_seq = self.enqueued_seq
+        self.worker = Thread(target=self._run, name='replication-worker', daemon=True)
+
+    def _read_ack(self):
         try:
-            logger.info(f"Propagating {operation} for book {book_id} to replica-2 (attempt {attempt + 1})")
-            response = requests.post(
-                f'{REPLICA_2_URL}/sync',
-                json=payload,
-                timeout=5
-            )
+            with open(self.ack_file, 'r') as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_ack(self, seq):
+        tmp_file = f"{self.ack_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(str(seq))
+        os.replace(tmp_file, self.ack_file)
+
+    def _rewrite_spool(self):
+        tmp_file = f"{self.queue_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            for entry in self.pending:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.queue_file)
+        self.spool = open(self.queue_file, 'a')
+
+    def start(self):
+        self.worker.start()
+
+    def enqueue(self, seq, operation, book_id, data):
+        entry = {'seq': seq, 'operation': operation, 'book_id': book_id, 'data': data, 'enqueued_at': time()}
+        with self.cond:
+            self.spool.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.pending.append(entry)
+            self.enqueued_seq = seq
+            self.cond.notify()
+
+    def sync(self, seq):
+        """Block until the entry with `seq` is on disk (group fsync)."""
+        if self.synced_seq >= seq:
+            return
+        with self.sync_lock:
+            if self.synced_seq >= seq:
+                return
+            with self.cond:
+                self.spool.flush()
+                target = self.enqueued_seq
+                # The worker may swap the spool meanwhile; the new one is already fsynced
+                fd = os.dup(self.spool.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.synced_seq = target
+
+    def wait_acked(self, seq, timeout):
+        """Wait until the backup has applied `seq` (or stop waiting, see above).
+
+        Returns False if the write was discarded instead: this node lost
+        the primary role before the backup had it.
+        """
+        with self.cond:
+            if not self.lagging and not self.acked.wait_for(lambda: self.acked_seq >= seq, timeout):
+                self.lagging = True
+                logger.warning(f"Backup did not apply seq {seq} within {timeout}s; answering writes without waiting until it catches up")
+            first, last = self.discarded_seqs
+            return not first <= seq <= last
+
+    def _append(self, path, batch):
+        with open(path, 'a') as f:
+            for entry in batch:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _dead_letter(self, batch):
+        self._append(self.dead_letter_file, batch)
+        self.dead_lettered += len(batch)
+        logger.error(f"Backup rejected writes {batch[0]['seq']}..{batch[-1]['seq']}; moved them to {self.dead_letter_file}")
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch = list(islice(self.pending, BATCH_SIZE))
+                generation = self.generation
             
-            if response.status_code == 200:
-                logger.info(f"Successfully propagated {operation} for book {book_id}")
-                return True
+            sent, rejected = send_batch(batch)
+            
+            with self.cond:
+                if generation != self.generation:
+                    continue
+                if rejected:
+                    self._dead_letter(batch)
+                    sent = len(batch)
+                for _ in range(sent):
+                    self.pending.popleft()
+                if sent:
+                    self.acked_seq = batch[sent - 1]['seq']
+                    self._write_ack(self.acked_seq)
+                    if not self.pending:
+                        self.spool.close()
+                        self._rewrite_spool()
+                        if self.lagging:
+                            self.lagging = False
+                            logger.info(f"Backup caught up at seq {self.acked_seq}; writes wait for it again")
+                    self.acked.notify_all()
+            
+            if rejected:
+                request_resync(PEER_URL)
+            if sent < len(batch):
+                failures += 1
+                sleep(min(RETRY_DELAY * (2 ** (failures - 1)), MAX_RETRY_DELAY))
             else:
-                logger.warning(f"Replica-2 returned status {response.status_code}")
-        
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to propagate to replica-2: {str(e)}")
-        
-        if attempt < MAX_RETRIES - 1:
-            sleep(RETRY_DELAY * (2 ** attempt))
-    
-    logger.error(f"Failed to propagate {operation} for book {book_id} after {MAX_RETRIES} attempts")
-    return False
+                failures = 0
+
+    def discard(self):
+        """Drop every pending entry: writes a new primary will never accept.
+
+        They are appended to the discarded file first, so an operator can
+        see (and replay by hand) every write that failover lost.
+        """
+        with self.cond:
+            dropped = list(self.pending)
+            if dropped:
+                self._append(self.discarded_file, dropped)
+                self.discarded_seqs = (dropped[0]['seq'], dropped[-1]['seq'])
+            self.pending.clear()
+            self.generation += 1
+            self.acked_seq = self.enqueued_seq
+            self._write_ack(self.acked_seq)
+            self.spool.close()
+            self._rewrite_spool()
+            self.lagging = False
+            self.acked.notify_all()
+        if dropped:
+            logger.error(f"Discarded {len(dropped)} writes the new primary never received; saved them to {self.discarded_file}")
+
+    def begin_term(self, seq):
+        """Move our positions to the start of a new term (see term_start).
+
+        Otherwise the first write of the term would count every skipped
+        sequence number as lag.
+        """
+        with self.cond:
+            self.enqueued_seq = max(self.enqueued_seq, seq)
+            self.synced_seq = max(self.synced_seq, self.enqueued_seq)
+            if not self.pending:
+                self.acked_seq = self.enqueued_seq
+                self._write_ack(self.acked_seq)
+
+    def stats(self):
+        with self.cond:
+            oldest = self.pending[0]['enqueued_at'] if self.pending else None
+            return {
+                "queue_depth": len(self.pending),
+                "enqueued_seq": self.enqueued_seq,
+                "acked_seq": self.acked_seq,
+                "lag_seq": self.enqueued_seq - self.acked_seq,
+                "lag_seconds": round(time() - oldest, 3) if oldest else 0,
+                "lagging": self.lagging,
+                "dead_lettered": self.dead_lettered
+            }
 
 
-def invalidate_cache(book_id, topics=None):
+def send_batch(batch):
+    """Ship consecutive entries to the backup.
+
+    Returns how many were acked and whether the backup rejected the batch
+    outright (a 4xx), which retrying would not change.
+    """
     payload = {
-        'book_id': book_id,
-        'topics': topics or []
+        'ops': [
+            {'seq': entry['seq'], 'operation': entry['operation'], 'book_id': entry['book_id'], 'data': entry['data']}
+            for entry in batch
+        ]
     }
+    try:
+        response = http_pool.post(
+            f'{PEER_URL}/sync/batch',
+            json=payload
+        )
+        if response.status_code != 200:
+            logger.warning(f"Backup returned status {response.status_code} for batch ending at seq {batch[-1]['seq']}")
+            return 0, 400 <= response.status_code < 500
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to propagate batch to backup: {str(e)}")
+        return 0, False
     
+    applied_seq = response.json().get('applied_seq') or 0
+    logger.info(f"Replicated {len(batch)} writes to backup, applied seq {applied_seq}")
+    return sum(1 for entry in batch if entry['seq'] <= applied_seq), False
+
+
+def request_resync(url):
+    """Ask a backup to replace its state with our snapshot (best effort)."""
+    try:
+        http_pool.post(f'{url}/replication/resync')
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not ask {url} to resync: {str(e)}")
+
+
+replication_queue = None
+
+
+replication_log = deque(maxlen=LOG_RETENTION)
+
+
+def propagate_write(operation, book_id, data, seq):
+    replication_log.append({'seq': seq, 'operation': operation, 'book_id': book_id, 'data': data})
+    replication_queue.enqueue(seq, operation, book_id, data)
+
+
+def commit_write(seq):
+    """Block until the write with `seq` is queued for the backup and, if
+    REPLICATION_ACK_TIMEOUT is set, applied there (see ReplicationQueue.wait_acked).
+
+    Returns False only if the write was discarded while waiting.
+    """
+    replication_queue.sync(seq)
+    if REPLICATION_ACK_TIMEOUT <= 0:
+        return True
+    return replication_queue.wait_acked(seq, REPLICATION_ACK_TIMEOUT)
+
+
+def catch_up_payload(service_class, since, snapshot=False):
+    """Log entries after `since`, or a gzip'd snapshot if they were not
+    retained or `snapshot` is requested."""
+    entries = list(replication_log)
+    primary_seq = service_class.current_seq()
+    
+    if not snapshot:
+        if since >= primary_seq:
+            return {'mode': 'log', 'entries': [], 'primary_seq': primary_seq}
+        if entries and since >= entries[0]['seq'] - 1:
+            return {'mode': 'log', 'entries': [entry for entry in entries if entry['seq'] > since], 'primary_seq': primary_seq}
+    
+    catalog = gzip.compress(json.dumps(service_class.load_catalog(), separators=(',', ':')).encode())
+    logger.info(f"Shipping snapshot at seq {primary_seq} to replica at seq {since}")
+    return {'mode': 'snapshot', 'snapshot': base64.b64encode(catalog).decode(), 'primary_seq': primary_seq}
+
+
+class CacheUpdateQueue:
+    """In-memory outbound channel of cache updates to the frontend.
+
+    Only the newest state per book and the newest ETag per topic are kept,
+    so a burst of writes to a hot book collapses into one message and the
+    pending set never outgrows the catalog. A background worker sends
+    everything pending in batches; a failed batch is merged back under any
+    newer state and retried with capped backoff.
+    """
+
+    def __init__(self):
+        self.cond = Condition()
+        self.books = OrderedDict()
+        self.searches = {}
+        self.enqueued = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.batches = 0
+        self.sending = False
+        self.worker = Thread(target=self._run, name='cache-update-worker', daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def enqueue(self, book_id, book_info, etag, searches):
+        update = {'book_id': book_id, 'data': book_info, 'etag': etag}
+        with self.cond:
+            self.enqueued += 1
+            if book_id in self.books:
+                self.coalesced += 1
+            self._merge([update], searches)
+            self.cond.notify_all()
+
+    def _merge(self, updates, searches):
+        for update in updates:
+            current = self.books.get(update['book_id'])
+            if current is None or current['data']['version'] < update['data']['version']:
+                self.books[update['book_id']] = update
+        self.searches.update(searches)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self.cond:
+                while not self.books and not self.searches:
+                    self.cond.wait()
+            # Give concurrent writes a moment to join the batch
+            sleep(CACHE_UPDATE_LINGER)
+            
+            with self.cond:
+                count = min(len(self.books), CACHE_UPDATE_BATCH_SIZE)
+                updates = [self.books.popitem(last=False)[1] for _ in range(count)]
+                searches, self.searches = self.searches, {}
+                self.sending = True
+            
+            if send_cache_updates(updates, searches):
+                failures = 0
+                with self.cond:
+                    self.sent += len(updates)
+                    self.batches += 1
+                    self.sending = False
+                    self.cond.notify_all()
+                continue
+            
+            with self.cond:
+                # Anything enqueued meanwhile is newer than the failed batch
+                pending_searches, self.searches = self.searches, searches
+                self._merge(updates, pending_searches)
+                self.sending = False
+            failures += 1
+            sleep(min(RETRY_DELAY * (2 ** (failures - 1)), MAX_RETRY_DELAY))
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds for everything pending to be sent (at shutdown)."""
+        deadline = monotonic() + timeout
+        with self.cond:
+            while self.books or self.searches or self.sending:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def stats(self):
+        with self.cond:
+            return {
+                "pending_books": len(self.books),
+                "pending_topics": len(self.searches),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "sent": self.sent,
+                "batches": self.batches
+            }
+
+
+def send_cache_updates(updates, searches):
+    """POST one batch of cache updates to the frontend; returns True on success."""
+    payload = {'updates': updates, 'searches': searches}
     try:
-        logger.info(f"Sending cache invalidation for book {book_id}, topics: {topics}")
-        response = requests.post(
-            f'{FRONTEND_URL}/invalidate-cache',
-            json=payload,
-            timeout=5
+        response = http_pool.post(
+            f'{FRONTEND_URL}/update-cache',
+            json=payload
         )
-        
-        if response.status_code == 200:
-            logger.info(f"Successfully invalidated cache for book {book_id}")
-            return True
-        else:
-            logger.warning(f"Frontend returned status {response.status_code} for cache invalidation")
+        if response.status_code != 200:
+            logger.warning(f"Frontend returned status {response.status_code} for cache update batch")
             return False
-    
     except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to invalidate cache: {str(e)}")
+        logger.error(f"Failed to send cache updates: {str(e)}")
         return False
+    
+    logger.info(f"Sent cache updates for {len(updates)} books and {len(searches)} topics")
+    return True
+
+
+cache_update_queue = None
+
+
+def update_cache(book_id, book_info, etag, searches=None):
+    """Queue the book's new info (and new search ETags) for the frontend cache."""
+    cache_update_queue.enqueue(book_id, book_info, etag, searches or {})
+
+
+OPERATIONS = ('decrement', 'update_price', 'update_stock')
+
+
+def to_record(op):
+    """Convert a replicated op into a store record.
+
+    The primary ships the book's state after the write, stamped with the
+    write's seq (the book's new version), so applying it is last-writer-wins
+    by seq and safe to retry.
+    """
+    operation = op['operation']
+    data = op['data']
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    
+    record = {"seq": op['seq'], "op": operation, "book_id": op['book_id']}
+    if 'quantity' in data:
+        record["quantity"] = data['quantity']
+    if 'price' in data:
+        record["price"] = data['price']
+    return record
+
+
+def apply_batch(service_class, ops):
+    try:
+        records = sorted((to_record(op) for op in ops), key=lambda record: record["seq"])
+        applied, applied_seq = service_class.apply_replicated(records)
+        if records:
+            applied_seq = max(applied_seq, records[-1]["seq"])
+        
+        logger.info(f"Synced {len(applied)} of {len(records)} operations, applied seq {applied_seq}")
+        return True, f"Applied {len(applied)} of {len(records)} operations", applied_seq
+    
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Error applying sync: {str(e)}")
+        return False, f"Sync error: {str(e)}", None
+
+
+def apply_sync(service_class, operation, book_id, data, seq):
+    return apply_batch(service_class, [{'seq': seq, 'operation': operation, 'book_id': book_id, 'data': data}])
+
+
+leadership = None
+resync = Event()
+
+
+def is_primary():
+    return leadership is not None and leadership.is_leader()
+
+
+def primary_url():
+    """The current primary as far as this node knows (None if unknown)."""
+    if leadership is None:
+        return None
+    return leadership.leader_url
+
+
+def catch_up(service_class, snapshot=False):
+    """Pull whatever the primary has beyond our last applied seq."""
+    source = primary_url() or PEER_URL
+    since = service_class.current_seq()
+    response = http_pool.get(f'{source}/replication/log', params={'since': since, 'snapshot': int(snapshot)})
+    response.raise_for_status()
+    payload = response.json()['data']
+    
+    if payload['mode'] == 'snapshot':
+        catalog = json.loads(gzip.decompress(base64.b64decode(payload['snapshot'])))
+        service_class.install_snapshot(catalog, payload['primary_seq'])
+        logger.info(f"Installed snapshot from primary at seq {payload['primary_seq']} (was at seq {since})")
+        return True
+    
+    if payload['entries']:
+        success, message, applied_seq = apply_batch(service_class, payload['entries'])
+        if not success:
+            raise ValueError(message)
+        logger.info(f"Caught up from seq {since} to {applied_seq} via log shipping")
+    return True
+
+
+def run_catch_up(service_class):
+    failures = 0
+    while True:
+        if not is_primary() and primary_url() != SELF_URL:
+            try:
+                catch_up(service_class, snapshot=resync.is_set())
+                resync.clear()
+                failures = 0
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                failures += 1
+                logger.warning(f"Catch-up with primary failed: {str(e)}")
+                if isinstance(e, ValueError):
+                    # Log entries we cannot apply will not apply next time either
+                    resync.set()
+                sleep(min(RETRY_DELAY * (2 ** (failures - 1)), MAX_RETRY_DELAY))
+                continue
+        
+        if CATCH_UP_INTERVAL <= 0:
+            return
+        # A change of primary wakes us up early
+        if leadership.changed.wait(CATCH_UP_INTERVAL):
+            leadership.changed.clear()
+
+
+def request_snapshot():
+    """Reinstall the primary's snapshot at the next catch-up, which starts now."""
+    resync.set()
+    leadership.changed.set()
+
+
+def term_start(epoch, *positions):
+    """First seq of a new primary's term.
+
+    Seqs order by term first, so they stay above anything an earlier
+    primary wrote, even after its last reported position. The term exceeds
+    every term seen in `positions` as well as the lease epoch, which alone
+    restarts at 1 with the coordinator.
+    """
+    term = max([epoch] + [(position >> TERM_BITS) + 1 for position in positions])
+    return term << TERM_BITS
+
+
+def promote(service_class, granted):
+    """Start a new term so our writes order after the previous primary's."""
+    previous_seq = granted['previous_position']
+    service_class.advance_seq(term_start(granted['epoch'], service_class.current_seq(), previous_seq))
+    replication_queue.begin_term(service_class.current_seq())
+    logger.warning(f"Promoted to primary at seq {service_class.current_seq()} (previous primary reported seq {previous_seq})")
+
+
+def follow(granted):
+    """Start following a new primary.
+
+    Writes of ours it never received are gone: drop what we had queued for
+    it and replace our state with its snapshot on the next catch-up.
+    """
+    replication_queue.discard()
+    replication_log.clear()
+    resync.set()
+    logger.info(f"Following primary {granted['url'] if granted else 'unknown'}")
+
+
+def start(service_class):
+    """Campaign for the catalog primary lease and follow whoever holds it.
+
+    The replication and cache update queues start here, not at import, so
+    importing the module (as the tests do) has no side effects.
+    """
+    global leadership, replication_queue, cache_update_queue
+    replication_queue = ReplicationQueue(QUEUE_FILE)
+    replication_queue.start()
+    cache_update_queue = CacheUpdateQueue()
+    cache_update_queue.start()
+    # Writes since the last WAL compaction survive a restart, so backups
+    # that are not too far behind can still catch up from the log
+    replication_log.extend(service_class.recovered_writes())
+    leadership = lease.LeaseHolder(
+        'catalog', NODE_ID, SELF_URL,
+        position=service_class.current_seq,
+        on_elected=lambda granted: promote(service_class, granted),
+        on_follow=follow,
+        standby=STANDBY
+    )
+    leadership.start()
+    Thread(target=run_catch_up, args=(service_class,), name='catch-up', daemon=True).start()
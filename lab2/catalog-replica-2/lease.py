@@ -0,0 +1,140 @@
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+
+import requests
+
+import http_pool
+
+logger = logging.getLogger(__name__)
+
+# Without a coordinator, replica-1 of each group is the fixed primary
+COORDINATOR_URL = os.getenv('COORDINATOR_URL', '')
+LEASE_TTL = float(os.getenv('LEASE_TTL', '3'))
+LOOKUP_TTL = 1.0
+COORDINATOR_TIMEOUT = 1.0
+
+
+class LeaderLookup:
+    """Cached answer to "which URL is the primary of `group`?".
+
+    Asks the coordinator at most once per LOOKUP_TTL and keeps the last
+    answer while it is unreachable; `fallback_url` is used until the
+    coordinator has answered once, or always if there is no coordinator.
+    """
+
+    def __init__(self, group, fallback_url):
+        self.group = group
+        self.leader_url = fallback_url
+        self.checked_at = 0.0
+        self.lock = Lock()
+
+    def url(self):
+        if not COORDINATOR_URL or time.monotonic() - self.checked_at < LOOKUP_TTL:
+            return self.leader_url
+        if not self.lock.acquire(blocking=False):
+            return self.leader_url
+        try:
+            response = http_pool.get(f'{COORDINATOR_URL}/leader/{self.group}', timeout=COORDINATOR_TIMEOUT)
+            if response.status_code == 200:
+                leader_url = response.json()['data']['url']
+                if leader_url != self.leader_url:
+                    logger.info(f"Primary of {self.group} is now {leader_url}")
+                self.leader_url = leader_url
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Coordinator lookup for {self.group} failed: {str(e)}")
+        finally:
+            self.checked_at = time.monotonic()
+            self.lock.release()
+        return self.leader_url
+
+    def refresh(self):
+        """Forget the cached answer, e.g. after the primary turned a write away."""
+        self.checked_at = 0.0
+        return self.url()
+
+
+class LeaseHolder:
+    """Campaigns for and renews this node's primary lease of `group`.
+
+    The lease is renewed every LEASE_TTL / 3 seconds. A holder that cannot
+    renew stops acting as primary when its lease would run out, measured
+    from before its last successful request, so it always steps down
+    before the coordinator can elect someone else. `standby` nodes wait one
+    TTL before their first campaign so the preferred node wins at startup.
+
+    `position` returns the node's log position, reported on every renewal.
+    `on_elected(lease)` runs before this node starts acting as primary; the
+    lease carries the previous holder's last reported position.
+    `on_follow(lease)` runs when another node is found holding a new epoch,
+    whether this node just lost the lease or has only just started.
+    """
+
+    def __init__(self, group, node, url, position, on_elected=None, on_follow=None, standby=False):
+        self.group = group
+        self.node = node
+        self.url = url
+        self.position = position
+        self.on_elected = on_elected
+        self.on_follow = on_follow
+        self.standby = standby
+        self.leading = not COORDINATOR_URL and not standby
+        self.epoch = 0
+        self.expires_at = float('inf') if self.leading else 0.0
+        self.leader_url = url if self.leading else None
+        self.changed = Event()
+        self.thread = Thread(target=self._run, name=f'{group}-lease', daemon=True)
+
+    def start(self):
+        if COORDINATOR_URL:
+            self.thread.start()
+
+    def is_leader(self):
+        return self.leading and time.monotonic() < self.expires_at
+
+    def _run(self):
+        if self.standby:
+            time.sleep(LEASE_TTL)
+        while True:
+            self._campaign()
+            time.sleep(LEASE_TTL / 3)
+
+    def _campaign(self):
+        started = time.monotonic()
+        try:
+            response = http_pool.post(
+                f'{COORDINATOR_URL}/lease/{self.group}',
+                json={'node': self.node, 'url': self.url, 'position': self.position()},
+                timeout=COORDINATOR_TIMEOUT
+            )
+            lease = response.json().get('data')
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Lease renewal for {self.group} failed: {str(e)}")
+            if self.leading and time.monotonic() >= self.expires_at:
+                self.leading = False
+                logger.warning(f"Lease of {self.group} ran out, no longer acting as primary")
+                self.changed.set()
+            return
+
+        if response.status_code == 200:
+            self.expires_at = started + lease['ttl']
+            self.leader_url = self.url
+            if not self.leading or lease['epoch'] != self.epoch:
+                self.epoch = lease['epoch']
+                logger.info(f"Became primary of {self.group} (epoch {self.epoch}, previous position {lease['previous_position']})")
+                # Prepare (e.g. skip past the old primary's ids) before taking writes
+                if self.on_elected:
+                    self.on_elected(lease)
+                self.leading = True
+                self.changed.set()
+        elif lease is not None:
+            self.leader_url = lease['url']
+            if lease['epoch'] != self.epoch:
+                self.epoch = lease['epoch']
+                self.leading = False
+                self.expires_at = 0.0
+                logger.info(f"{lease['node']} is primary of {self.group} (epoch {self.epoch})")
+                if self.on_follow:
+                    self.on_follow(lease)
+                self.changed.set()
@@ -1,104 +1,188 @@
+import hashlib
 import json
 import os
-from threading import Lock
+from store import CatalogStore
 import sync
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'catalog.json')
-data_lock = Lock()
+store = CatalogStore(DATA_FILE)
+# A write this node took as primary, then dropped on losing the role before the backup had it
+WRITE_LOST = "Write lost: this replica stopped being the primary before it was replicated"
 
 
 class CatalogService:
     @staticmethod
     def load_catalog():
-        with data_lock:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
+        return store.snapshot()
     
     @staticmethod
     def save_catalog(catalog):
-        with data_lock:
-            with open(DATA_FILE, 'w') as f:
-                json.dump(catalog, f, indent=2)
+        with store.exclusive():
+            store.replace(catalog)
+            store.persist()
     
     @staticmethod
-    def search_by_topic(topic):
-        catalog = CatalogService.load_catalog()
-        results = [
-            {"id": book["id"], "title": book["title"]}
-            for book in catalog
-            if book["topic"].lower() == topic.lower()
+    def install_snapshot(catalog, seq):
+        """Replace the catalog and log position with a primary's snapshot."""
+        with store.exclusive():
+            store.replace(catalog, seq)
+            store.persist()
+    
+    @staticmethod
+    def current_seq():
+        return store.seq
+    
+    @staticmethod
+    def advance_seq(seq):
+        with store.write_lock:
+            store.advance(seq)
+    
+    @staticmethod
+    def replicated_state(book):
+        return {"quantity": book["quantity"], "price": book["price"]}
+    
+    @staticmethod
+    def recovered_writes():
+        """Writes replayed from the WAL at startup, as replication log entries."""
+        return [
+            {'seq': record["seq"], 'operation': record["op"], 'book_id': record["book_id"],
+             'data': CatalogService.replicated_state(book)}
+            for record, book in store.replayed
         ]
-        return results
+    
+    @staticmethod
+    def record_write(op, book, **change):
+        """Log a mutation of `book` and queue it for replication in seq order.
+
+        The caller must hold the book's stripe lock.
+        """
+        with store.write_lock:
+            seq = store.mutate(op, book["id"], **change)
+            sync.propagate_write(op, book["id"], CatalogService.replicated_state(book), seq)
+        return seq
+    
+    @staticmethod
+    def commit(seq):
+        """Wait until the write is on disk (and applied by the backup, if
+        writes wait for it).
+
+        Returns False if it was discarded because this node lost the
+        primary role first.
+        """
+        store.commit(seq)
+        return sync.commit_write(seq)
+    
+    @staticmethod
+    def apply_replicated(records):
+        with store.exclusive():
+            applied = store.log(records)
+            applied_seq = store.seq
+        store.commit(applied_seq)
+        return applied, applied_seq
+    
+    @staticmethod
+    def search_by_topic(topic):
+        """Return the matching books and an ETag derived from the ids and titles listed.
+
+        Purchases and price or stock changes leave the body as it is, so
+        they leave its ETag as it is too.
+        """
+        books = store.search(topic)
+        results = [{"id": book["id"], "title": book["title"]} for book in books]
+        listed = json.dumps(results, separators=(',', ':'))
+        etag = f"s-{hashlib.sha1(listed.encode()).hexdigest()[:16]}"
+        return results, etag
+    
+    @staticmethod
+    def book_info(book):
+        return {
+            "title": book["title"],
+            "quantity": book["quantity"],
+            "price": book["price"],
+            "version": book.get("seq", 0)
+        }
+    
+    @staticmethod
+    def info_etag(book_id, book_info):
+        return f"b{book_id}-v{book_info['version']}"
     
     @staticmethod
     def get_book_info(book_id):
-        catalog = CatalogService.load_catalog()
-        for book in catalog:
-            if book["id"] == book_id:
-                return {
-                    "title": book["title"],
-                    "quantity": book["quantity"],
-                    "price": book["price"]
-                }
-        return None
+        book = store.get(book_id)
+        if book is None:
+            return None
+        return CatalogService.book_info(book)
     
     @staticmethod
-    def decrement_quantity(book_id):
-        catalog = CatalogService.load_catalog()
-        book_topic = None
+    def push_cache_update(book_id, book_info):
+        """Write the new state through to the frontend cache instead of invalidating it.
+
+        Cached searches are left alone: a write does not change what they list.
+        """
+        sync.update_cache(book_id, book_info, f'"{CatalogService.info_etag(book_id, book_info)}"')
+    
+    @staticmethod
+    def purchase(book_id):
+        """Decrement stock and return the book as it is right after this purchase."""
+        with store.lock_for(book_id):
+            book = store.get(book_id)
+            if book is None:
+                return False, "Book not found", None
+            if book["quantity"] <= 0:
+                return False, "Out of stock", None
+            
+            seq = CatalogService.record_write('decrement', book, delta=-1)
+            book_info = CatalogService.book_info(book)
+        if not CatalogService.commit(seq):
+            return False, WRITE_LOST, None
         
-        for book in catalog:
-            if book["id"] == book_id:
-                if book["quantity"] > 0:
-                    book["quantity"] -= 1
-                    book_topic = book["topic"]
-                    CatalogService.save_catalog(catalog)
-                    
-                    sync.propagate_write('decrement', book_id, {'quantity': book["quantity"]})
-                    sync.invalidate_cache(book_id, [book_topic])
-                    
-                    return True, "Quantity decremented successfully"
-                else:
-                    return False, "Out of stock"
-        return False, "Book not found"
+        CatalogService.push_cache_update(book_id, book_info)
+        
+        return True, "Quantity decremented successfully", book_info
+    
+    @staticmethod
+    def decrement_quantity(book_id):
+        success, message, _ = CatalogService.purchase(book_id)
+        return success, message
     
     @staticmethod
     def update_price(book_id, new_price):
         if new_price <= 0:
             return False, "Price must be greater than 0"
         
-        catalog = CatalogService.load_catalog()
-        for book in catalog:
-            if book["id"] == book_id:
-                old_price = book["price"]
-                book["price"] = new_price
-                book_topic = book["topic"]
-                CatalogService.save_catalog(catalog)
-                
-                sync.propagate_write('update_price', book_id, {'price': new_price})
-                sync.invalidate_cache(book_id, [book_topic])
-                
-                return True, f"Price updated from ${old_price} to ${new_price}"
-        return False, "Book not found"
+        with store.lock_for(book_id):
+            book = store.get(book_id)
+            if book is None:
+                return False, "Book not found"
+            
+            old_price = book["price"]
+            seq = CatalogService.record_write('update_price', book, price=new_price)
+            book_info = CatalogService.book_info(book)
+        if not CatalogService.commit(seq):
+            return False, WRITE_LOST
+        
+        CatalogService.push_cache_update(book_id, book_info)
+        
+        return True, f"Price updated from ${old_price} to ${new_price}"
     
     @staticmethod
     def update_stock(book_id, quantity_change):
-        catalog = CatalogService.load_catalog()
-        for book in catalog:
-            if book["id"] == book_id:
-                new_quantity = book["quantity"] + quantity_change
-                if new_quantity < 0:
-                    return False, f"Cannot reduce stock below 0. Current: {book['quantity']}, Requested change: {quantity_change}"
-                
-                old_quantity = book["quantity"]
-                book["quantity"] = new_quantity
-                book_topic = book["topic"]
-                CatalogService.save_catalog(catalog)
-                
-                sync.propagate_write('update_stock', book_id, {'quantity_change': quantity_change})
-                sync.invalidate_cache(book_id, [book_topic])
-                
-                action = "increased" if quantity_change > 0 else "decreased"
-                return True, f"Stock {action} from {old_quantity} to {new_quantity}"
-        return False, "Book not found"
-
+        with store.lock_for(book_id):
+            book = store.get(book_id)
+            if book is None:
+                return False, "Book not found"
+            
+            new_quantity = book["quantity"] + quantity_change
+            if new_quantity < 0:
+                return False, f"Cannot reduce stock below 0. Current: {book['quantity']}, Requested change: {quantity_change}"
+            
+            old_quantity = book["quantity"]
+            seq = CatalogService.record_write('update_stock', book, delta=quantity_change)
+            book_info = CatalogService.book_info(book)
+        if not CatalogService.commit(seq):
+            return False, WRITE_LOST
+        
+        CatalogService.push_cache_update(book_id, book_info)
+        
+        action = "increased" if quantity_change > 0 else "decreased"
+        return True, f"Stock {action} from {old_quantity} to {new_quantity}"
@@ -0,0 +1,88 @@
+from flask import Flask, jsonify, request
+import logging
+import os
+import time
+from threading import Lock
+
+app = Flask(__name__)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEASE_TTL = float(os.getenv('LEASE_TTL', '3'))
+
+# group -> {"node", "url", "epoch", "position", "previous_position", "expires_at"}
+leases = {}
+leases_lock = Lock()
+
+
+def lease_view(lease, now):
+    return {
+        "node": lease["node"],
+        "url": lease["url"],
+        "epoch": lease["epoch"],
+        "position": lease["position"],
+        "previous_position": lease["previous_position"],
+        "expires_in": round(max(lease["expires_at"] - now, 0), 3),
+        "ttl": LEASE_TTL
+    }
+
+
+@app.route('/lease/<group>', methods=['POST'])
+def acquire_lease(group):
+    """Grant or renew the primary lease of `group`.
+
+    A node gets the lease if nobody holds it, the holder's lease has
+    expired, or it already holds it. Every change of holder starts a new
+    epoch, and the new holder learns the last log position the previous
+    holder reported so it can continue past it.
+    """
+    data = request.get_json()
+    if not data or not data.get('node') or not data.get('url'):
+        return jsonify({"success": False, "message": "Missing 'node' or 'url' in request body"}), 400
+
+    node = data['node']
+    position = data.get('position', 0)
+
+    with leases_lock:
+        now = time.monotonic()
+        lease = leases.get(group)
+        if lease is not None and lease["node"] != node and lease["expires_at"] > now:
+            return jsonify({"success": False, "message": "Lease held by another node", "data": lease_view(lease, now)}), 409
+
+        if lease is None or lease["node"] != node:
+            previous_position = max(lease["position"], lease["previous_position"]) if lease else 0
+            lease = {
+                "node": node,
+                "epoch": (lease["epoch"] if lease else 0) + 1,
+                "position": position,
+                "previous_position": previous_position
+            }
+            leases[group] = lease
+            logger.info(f"Elected {node} primary of {group} (epoch {lease['epoch']}, position {position}, previous position {previous_position})")
+
+        lease["url"] = data['url']
+        lease["position"] = max(lease["position"], position)
+        lease["expires_at"] = now + LEASE_TTL
+        return jsonify({"success": True, "data": lease_view(lease, now)}), 200
+
+
+@app.route('/leader/<group>', methods=['GET'])
+def get_leader(group):
+    with leases_lock:
+        now = time.monotonic()
+        lease = leases.get(group)
+        if lease is None or lease["expires_at"] <= now:
+            return jsonify({"success": False, "message": f"No primary for {group}"}), 404
+        return jsonify({"success": True, "data": lease_view(lease, now)}), 200
+
+
+@app.route('/leases', methods=['GET'])
+def get_leases():
+    with leases_lock:
+        now = time.monotonic()
+        return jsonify({"success": True, "data": {group: lease_view(lease, now) for group, lease in leases.items()}}), 200
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=8090)
@@ -0,0 +1,15 @@
+"""Gunicorn settings for the lease coordinator: `gunicorn app:app`."""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8090')}"
+worker_class = 'gthread'
+# Leases are held in memory and must have a single owner
+workers = 1
+threads = int(os.getenv('WEB_THREADS', '8'))
+# Idle client connections stay open this many seconds for the next request
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+# On SIGTERM a worker stops accepting and finishes in-flight requests for up to this long
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '10'))
+# Each worker imports the app itself so its background threads run in the worker
+preload_app = False
@@ -1,9 +1,18 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 import requests
+import hashlib
 import os
-from collections import OrderedDict
-from threading import Lock
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock, Thread
 import logging
+import http_pool
+import lease
+from balancer import ReplicaSelector, RetryBudget
+from cache import SegmentedCache, SharedCounters, SharedEpochs, SingleFlight
+from urllib3.exceptions import NewConnectionError
 
 app = Flask(__name__)
 
@@ -19,118 +28,354 @@ ORDER_REPLICAS = [
     os.getenv('ORDER_REPLICA_2_URL', 'http://order-replica-2:8083')
 ]
 
-CATALOG_PRIMARY = CATALOG_REPLICAS[0]
-ORDER_PRIMARY = ORDER_REPLICAS[0]
+# Catalog writes go to whichever replica holds the primary lease (replica-1 without a coordinator)
+catalog_primary = lease.LeaderLookup('catalog', CATALOG_REPLICAS[0])
+
+MAX_CACHE_SIZE = int(os.getenv('MAX_CACHE_SIZE', '100'))
+CACHE_SEGMENTS = int(os.getenv('CACHE_SEGMENTS', '16'))
+CACHE_POLICY = os.getenv('CACHE_POLICY', 'lru')
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', '0')) or None
+cache = SegmentedCache(MAX_CACHE_SIZE, CACHE_SEGMENTS, CACHE_POLICY, max_bytes=CACHE_MAX_BYTES)
+inflight = SingleFlight()
+
+
+def open_shared(open_file, suffix=''):
+    """Open a file shared by the workers, next to the CACHE_EPOCH_FILE the
+    gunicorn master created (see gunicorn.conf.py)."""
+    path = os.getenv('CACHE_EPOCH_FILE')
+    if path:
+        return open_file(path + suffix)
+    # A lone process (`python app.py`) shares with nobody: keep a private, unlinked file
+    fd, path = tempfile.mkstemp(prefix='bazar-frontend-cache-epochs-')
+    os.close(fd)
+    try:
+        return open_file(path)
+    finally:
+        os.remove(path)
+
+
+# Each worker process has its own cache; changes announced to any worker are
+# published here so the other workers' copies of those keys count as stale.
+epochs = open_shared(SharedEpochs)
+# /cache-stats reports all workers: counters are added as events happen, the
+# gauges are republished by each worker every STATS_PUBLISH_INTERVAL seconds.
+SHARED_COUNTERS = ('hits', 'misses', 'invalidations', 'evictions', 'coalesced', 'stale_served', 'revalidated')
+SHARED_GAUGES = ('size', 'bytes_used')
+STATS_PUBLISH_INTERVAL = 1.0
+shared_stats = open_shared(lambda path: SharedCounters(path, SHARED_COUNTERS, SHARED_GAUGES), '.stats')
+
+# Seconds an entry is fresh, per key class ("info:..." / "search:..."); 0 disables expiry.
+# Past its TTL an entry is still served for CACHE_STALE_WINDOW seconds while one
+# background request revalidates it.
+CACHE_TTLS = {
+    'info': float(os.getenv('CACHE_TTL_INFO', '30')),
+    'search': float(os.getenv('CACHE_TTL_SEARCH', '300'))
+}
+CACHE_STALE_WINDOW = float(os.getenv('CACHE_STALE_WINDOW', '30'))
+
+# A cached 200 response: the encoded JSON body exactly as it is sent to clients.
+# `version` is the book version for info entries and None for search results;
+# `epoch` is the key's shared change counter when the entry was fetched.
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'fetched_at', 'version', 'epoch'])
+
+published_coalesced = 0
+stats_lock = Lock()
+
+catalog_selector = ReplicaSelector(
+    CATALOG_REPLICAS,
+    probe_interval=float(os.getenv('HEALTH_CHECK_INTERVAL', '2')),
+    probe_timeout=float(os.getenv('HEALTH_CHECK_TIMEOUT', '1'))
+)
+catalog_selector.start()
+# Both order replicas take purchases, so /buy is balanced like catalog reads
+order_selector = ReplicaSelector(
+    ORDER_REPLICAS,
+    name='order',
+    probe_interval=float(os.getenv('HEALTH_CHECK_INTERVAL', '2')),
+    probe_timeout=float(os.getenv('HEALTH_CHECK_TIMEOUT', '1'))
+)
+order_selector.start()
+
+# A read slower than this percentile of recent reads is hedged to another replica,
+# and a failed read is retried there; both draw on the same retry budget.
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+HEDGE_MIN_DELAY = 0.005
+retry_budget = RetryBudget(ratio=float(os.getenv('RETRY_BUDGET_RATIO', '0.1')))
+catalog_executor = ThreadPoolExecutor(max_workers=http_pool.POOL_SIZE * len(CATALOG_REPLICAS))
 
-MAX_CACHE_SIZE = 100
-cache = OrderedDict()
-cache_lock = Lock()
-cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
 
-catalog_lb_index = 0
-order_lb_index = 0
-lb_lock = Lock()
+def get_from_cache(key):
+    value = cache.get(key)
+    if value is not None:
+        shared_stats.add('hits')
+        logger.info(f"Cache HIT for key: {key}")
+    else:
+        shared_stats.add('misses')
+        logger.info(f"Cache MISS for key: {key}")
+    return value
 
 
-def get_next_catalog_replica():
-    global catalog_lb_index
-    with lb_lock:
-        replica = CATALOG_REPLICAS[catalog_lb_index]
-        catalog_lb_index = (catalog_lb_index + 1) % len(CATALOG_REPLICAS)
-        logger.info(f"Load balancer selected catalog replica: {replica}")
-        return replica
+def publish_worker_stats():
+    """Copy this worker's cache size and coalesced misses to the shared stats."""
+    global published_coalesced
+    stats = cache.stats()
+    with stats_lock:
+        coalesced = inflight.coalesced
+        shared_stats.add('coalesced', coalesced - published_coalesced)
+        published_coalesced = coalesced
+    shared_stats.set('size', stats['size'])
+    shared_stats.set('bytes_used', stats['bytes_used'])
+    return stats
 
 
-def get_next_order_replica():
-    global order_lb_index
-    with lb_lock:
-        replica = ORDER_REPLICAS[order_lb_index]
-        order_lb_index = (order_lb_index + 1) % len(ORDER_REPLICAS)
-        logger.info(f"Load balancer selected order replica: {replica}")
-        return replica
+def run_stats_publisher():
+    while True:
+        time.sleep(STATS_PUBLISH_INTERVAL)
+        publish_worker_stats()
 
 
-def get_from_cache(key):
-    with cache_lock:
-        if key in cache:
-            cache.move_to_end(key)
-            cache_stats['hits'] += 1
-            logger.info(f"Cache HIT for key: {key}")
-            return cache[key]
-        else:
-            cache_stats['misses'] += 1
-            logger.info(f"Cache MISS for key: {key}")
+Thread(target=run_stats_publisher, name='stats-publisher', daemon=True).start()
+
+
+def make_cached_response(upstream, version=None, epoch=0):
+    """Keep the catalog's version-derived ETag; hash the body if it sent none."""
+    etag = upstream.headers.get('ETag') or f'"{hashlib.md5(upstream.content).hexdigest()}"'
+    return CachedResponse(upstream.content, etag, time.monotonic(), version, epoch)
+
+
+def entry_overdue(key, entry):
+    """Return how far past its TTL an entry is (<= 0 while fresh)."""
+    ttl = CACHE_TTLS.get(key.split(':', 1)[0], 0)
+    if not ttl:
+        return 0
+    return time.monotonic() - entry.fetched_at - ttl
+
+
+def send_cached(entry):
+    """Send a cached body, or 304 Not Modified if the client already has this ETag."""
+    response = Response(entry.body, status=200, mimetype='application/json', headers={'ETag': entry.etag})
+    return response.make_conditional(request)
+
+
+def put_in_cache(key, entry):
+    """Store entry unless the cache already holds a newer version of the book."""
+    def replace(current):
+        if current is not None and current.version is not None and entry.version is not None \
+                and current.version > entry.version:
             return None
+        return entry, len(entry.body)
+    
+    evicted = cache.update(key, replace)
+    shared_stats.add('evictions', len(evicted))
+    for evicted_key in evicted:
+        logger.info(f"Cache evicted oldest key: {evicted_key}")
 
 
-def put_in_cache(key, value):
-    with cache_lock:
-        if key in cache:
-            cache.move_to_end(key)
-        cache[key] = value
-        
-        if len(cache) > MAX_CACHE_SIZE:
-            oldest_key = next(iter(cache))
-            cache.pop(oldest_key)
-            logger.info(f"Cache evicted oldest key: {oldest_key}")
+def patch_cache(key, patch):
+    """Rewrite a cached entry in place with patch(entry); absent keys stay absent."""
+    patched = False
+    
+    def replace(current):
+        nonlocal patched
+        entry = patch(current) if current is not None else None
+        if entry is None:
+            return None
+        patched = True
+        return entry, len(entry.body)
+    
+    evicted = cache.update(key, replace)
+    shared_stats.add('evictions', len(evicted))
+    for evicted_key in evicted:
+        logger.info(f"Cache evicted oldest key: {evicted_key}")
+    return patched
 
 
 def invalidate_cache_entry(key):
-    with cache_lock:
-        if key in cache:
-            del cache[key]
-            cache_stats['invalidations'] += 1
-            logger.info(f"Cache invalidated key: {key}")
-            return True
-        return False
+    if cache.invalidate(key):
+        shared_stats.add('invalidations')
+        logger.info(f"Cache invalidated key: {key}")
+        return True
+    return False
 
 
-@app.route('/search/<topic>', methods=['GET'])
-def search(topic):
-    cache_key = f"search:{topic}"
+def catalog_attempt(replica_url, path, headers):
+    logger.info(f"Load balancer selected catalog replica: {replica_url}")
+    start = time.monotonic()
+    ok = False
+    try:
+        response = http_pool.get(f'{replica_url}{path}', headers=headers)
+        ok = response.status_code < 500
+        return response
+    finally:
+        catalog_selector.release(replica_url, time.monotonic() - start, ok)
+
+
+def catalog_get(path, headers=None):
+    """GET `path` from a catalog replica, failing over to another replica.
+
+    If the first replica has not answered by the hedge delay a second
+    request goes to another replica and the first good answer wins; a
+    connection error or 5xx is retried on a replica not tried yet. Extra
+    attempts are only made while the retry budget allows.
+    """
+    retry_budget.deposit()
+    tried = []
+    pending = set()
     
-    cached_result = get_from_cache(cache_key)
-    if cached_result is not None:
-        return jsonify(cached_result), 200
+    def launch():
+        replica_url = catalog_selector.acquire(exclude=tried)
+        tried.append(replica_url)
+        pending.add(catalog_executor.submit(catalog_attempt, replica_url, path, headers))
     
-    try:
-        replica_url = get_next_catalog_replica()
-        response = requests.get(f'{replica_url}/search/{topic}', timeout=5)
-        result = response.json()
+    def can_retry(kind):
+        return catalog_selector.has_available(exclude=tried) and retry_budget.withdraw(kind)
+    
+    launch()
+    hedge_delay = catalog_selector.latency_percentile(HEDGE_PERCENTILE)
+    if hedge_delay is not None:
+        hedge_delay = max(hedge_delay, HEDGE_MIN_DELAY)
+    
+    failure = None
+    while pending:
+        done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+        if not done:
+            hedge_delay = None
+            if can_retry('hedge'):
+                launch()
+                logger.info(f"Hedged slow catalog read of {path} to {tried[-1]}")
+            continue
         
-        if response.status_code == 200:
-            put_in_cache(cache_key, result)
+        for future in done:
+            pending.discard(future)
+            try:
+                response = future.result()
+                if response.status_code < 500:
+                    return response
+                failure = response
+            except requests.exceptions.RequestException as e:
+                failure = e
         
-        return jsonify(result), response.status_code
-    except requests.exceptions.RequestException as e:
-        return jsonify({"success": False, "message": f"Service unavailable: {str(e)}"}), 503
+        if not pending and can_retry('retry'):
+            launch()
+            logger.info(f"Retrying failed catalog read of {path} on {tried[-1]}")
+    
+    if isinstance(failure, Exception):
+        raise failure
+    return failure
 
 
-@app.route('/info/<int:book_id>', methods=['GET'])
-def info(book_id):
-    cache_key = f"info:{book_id}"
+def fetch_from_catalog(cache_key, path, cached=None):
+    """Fetch `path` from a catalog replica and cache it if it succeeded.
+
+    With a `cached` entry the request is conditional, and a 304 just
+    renews that entry.
+    """
+    headers = {'If-None-Match': cached.etag} if cached is not None else None
+    # Read before fetching: a change announced meanwhile leaves the entry stale
+    epoch = epochs.get(cache_key)
+    response = catalog_get(path, headers)
     
-    cached_result = get_from_cache(cache_key)
-    if cached_result is not None:
-        return jsonify(cached_result), 200
+    if response.status_code == 304 and cached is not None:
+        shared_stats.add('revalidated')
+        entry = cached._replace(fetched_at=time.monotonic(), epoch=epoch)
+        put_in_cache(cache_key, entry)
+        return 200, entry
+    if response.status_code == 200:
+        version = response.json()['data'].get('version') if cache_key.startswith('info:') else None
+        entry = make_cached_response(response, version, epoch)
+        put_in_cache(cache_key, entry)
+        return 200, entry
+    return response.status_code, response.content
+
+
+def refresh_in_background(cache_key, path, cached):
+    def refresh():
+        try:
+            fetch_from_catalog(cache_key, path, cached)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Background refresh of {cache_key} failed: {str(e)}")
+    
+    if inflight.do_in_background(cache_key, refresh):
+        logger.info(f"Cache refreshing stale key: {cache_key}")
+
+
+def read_through(cache_key, path):
+    cached = get_from_cache(cache_key)
+    # An entry changed through another worker is only good for revalidating
+    if cached is not None and cached.epoch == epochs.get(cache_key):
+        overdue = entry_overdue(cache_key, cached)
+        if overdue <= 0:
+            return send_cached(cached)
+        if overdue <= CACHE_STALE_WINDOW:
+            shared_stats.add('stale_served')
+            refresh_in_background(cache_key, path, cached)
+            return send_cached(cached)
     
     try:
-        replica_url = get_next_catalog_replica()
-        response = requests.get(f'{replica_url}/info/{book_id}', timeout=5)
-        result = response.json()
-        
-        if response.status_code == 200:
-            put_in_cache(cache_key, result)
-        
-        return jsonify(result), response.status_code
+        # Concurrent misses for the same key share one upstream fetch
+        status, result = inflight.do(cache_key, lambda: fetch_from_catalog(cache_key, path, cached))
     except requests.exceptions.RequestException as e:
         return jsonify({"success": False, "message": f"Service unavailable: {str(e)}"}), 503
+    
+    if status == 200:
+        return send_cached(result)
+    return Response(result, status=status, mimetype='application/json')
+
+
+@app.route('/search/<topic>', methods=['GET'])
+def search(topic):
+    return read_through(f"search:{topic}", f"/search/{topic}")
+
+
+@app.route('/info/<int:book_id>', methods=['GET'])
+def info(book_id):
+    return read_through(f"info:{book_id}", f"/info/{book_id}")
+
+
+def primary_request(primary, method, path, **kwargs):
+    """Send a write to the primary; if it answers 503 (it is not the primary
+    and did nothing) ask the coordinator again and retry once."""
+    response = http_pool.request(method, f'{primary.url()}{path}', **kwargs)
+    if response.status_code == 503:
+        response = http_pool.request(method, f'{primary.refresh()}{path}', **kwargs)
+    return response
+
+
+def never_sent(error):
+    """Whether a failed request certainly did not reach the server."""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+def order_post(path):
+    """POST to an order replica chosen by the selector.
+
+    A purchase is not idempotent, so it moves to another replica only when
+    the connection could not be opened; once sent it is never repeated.
+    """
+    tried = []
+    while True:
+        replica_url = order_selector.acquire(exclude=tried)
+        tried.append(replica_url)
+        logger.info(f"Load balancer selected order replica: {replica_url}")
+        start = time.monotonic()
+        try:
+            response = http_pool.post(f'{replica_url}{path}')
+        except requests.exceptions.RequestException as e:
+            order_selector.release(replica_url, time.monotonic() - start, False)
+            if not never_sent(e) or len(tried) == len(ORDER_REPLICAS):
+                raise
+            logger.warning(f"Order replica {replica_url} unreachable, trying another: {str(e)}")
+            continue
+        # A 503 reports the catalog unavailable, not this replica
+        order_selector.release(replica_url, time.monotonic() - start, response.status_code != 500)
+        return response
 
 
 @app.route('/buy/<int:book_id>', methods=['POST'])
 def buy(book_id):
     try:
-        response = requests.post(f'{ORDER_PRIMARY}/buy/{book_id}', timeout=5)
+        response = order_post(f'/buy/{book_id}')
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         return jsonify({"success": False, "message": f"Service unavailable: {str(e)}"}), 503
@@ -140,11 +385,10 @@ def buy(book_id):
 def update_price(book_id):
     try:
         data = request.get_json()
-        response = requests.put(
-            f'{CATALOG_PRIMARY}/update/{book_id}/price',
+        response = primary_request(
+            catalog_primary, 'PUT', f'/update/{book_id}/price',
             json=data,
-            headers={'Content-Type': 'application/json'},
-            timeout=5
+            headers={'Content-Type': 'application/json'}
         )
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
@@ -155,11 +399,10 @@ def update_price(book_id):
 def update_stock(book_id):
     try:
         data = request.get_json()
-        response = requests.put(
-            f'{CATALOG_PRIMARY}/update/{book_id}/stock',
+        response = primary_request(
+            catalog_primary, 'PUT', f'/update/{book_id}/stock',
             json=data,
-            headers={'Content-Type': 'application/json'},
-            timeout=5
+            headers={'Content-Type': 'application/json'}
         )
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
@@ -173,22 +416,27 @@ def invalidate_cache():
         if not data:
             return jsonify({"success": False, "message": "Missing request body"}), 400
         
-        book_id = data.get('book_id')
+        # Either a single book_id or a batch of book_ids, plus any topics
+        book_ids = list(data.get('book_ids', []))
+        if data.get('book_id') is not None:
+            book_ids.append(data['book_id'])
         topics = data.get('topics', [])
         
         invalidated_keys = []
         
-        if book_id is not None:
+        for book_id in book_ids:
             info_key = f"info:{book_id}"
+            epochs.bump(info_key)
             if invalidate_cache_entry(info_key):
                 invalidated_keys.append(info_key)
         
         for topic in topics:
             search_key = f"search:{topic}"
+            epochs.bump(search_key)
             if invalidate_cache_entry(search_key):
                 invalidated_keys.append(search_key)
         
-        logger.info(f"Cache invalidation request: book_id={book_id}, topics={topics}, invalidated={invalidated_keys}")
+        logger.info(f"Cache invalidation request: book_ids={book_ids}, topics={topics}, invalidated={invalidated_keys}")
         
         return jsonify({
             "success": True,
@@ -200,24 +448,121 @@ def invalidate_cache():
         return jsonify({"success": False, "message": f"Invalidation error: {str(e)}"}), 500
 
 
-@app.route('/cache-stats', methods=['GET'])
-def get_cache_stats():
-    with cache_lock:
-        total_requests = cache_stats['hits'] + cache_stats['misses']
-        hit_rate = (cache_stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+def valid_info_update(update):
+    return (isinstance(update, dict) and update.get('book_id') is not None and update.get('etag')
+            and isinstance(update.get('data'), dict) and 'version' in update['data'])
+
+
+def apply_info_update(update):
+    """Replace a cached info entry with a pushed one unless the cached one is as new."""
+    info_key = f"info:{update['book_id']}"
+    book_info = update['data']
+    body = jsonify({"success": True, "data": book_info}).get_data()
+    entry = CachedResponse(body, update['etag'], time.monotonic(), book_info['version'], epochs.bump(info_key))
+    
+    def newer_info(current):
+        if current.version is not None and current.version >= entry.version:
+            return current._replace(epoch=entry.epoch)
+        return entry
+    
+    return patch_cache(info_key, newer_info)
+
+
+@app.route('/update-cache', methods=['POST'])
+def update_cache():
+    """Write-through updates pushed by the catalog primary after writes.
+
+    Accepts a batch `{"updates": [{book_id, data, etag}, ...], "searches":
+    {topic: etag}}` or a single update with book_id/data/etag at the top
+    level. Cached info entries are replaced with the new value (if they are
+    cached and older), and cached searches over the topics get their new
+    ETag; their bodies only hold ids and titles, which a write does not
+    change.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "message": "Missing request body"}), 400
+        
+        updates = data.get('updates', [])
+        if data.get('book_id') is not None:
+            updates = updates + [data]
+        if any(not valid_info_update(update) for update in updates):
+            return jsonify({"success": False, "message": "Every update needs 'book_id', 'etag' and 'data' with a 'version'"}), 400
+        
+        updated_keys = []
+        for update in updates:
+            if apply_info_update(update):
+                updated_keys.append(f"info:{update['book_id']}")
+        
+        for topic, etag in data.get('searches', {}).items():
+            search_key = f"search:{topic}"
+            epoch = epochs.bump(search_key)
+            if patch_cache(search_key, lambda current: current._replace(etag=etag, fetched_at=time.monotonic(), epoch=epoch)):
+                updated_keys.append(search_key)
+        
+        logger.info(f"Cache update request: {len(updates)} books, updated={updated_keys}")
         
         return jsonify({
             "success": True,
-            "data": {
-                "hits": cache_stats['hits'],
-                "misses": cache_stats['misses'],
-                "invalidations": cache_stats['invalidations'],
-                "total_requests": total_requests,
-                "hit_rate_percent": round(hit_rate, 2),
-                "cache_size": len(cache),
-                "max_cache_size": MAX_CACHE_SIZE
-            }
+            "message": f"Updated {len(updated_keys)} cache entries",
+            "updated_keys": updated_keys
         }), 200
+    
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Cache update error: {str(e)}"}), 500
+
+
+@app.route('/lb-stats', methods=['GET'])
+def get_lb_stats():
+    hedge_delay = catalog_selector.latency_percentile(HEDGE_PERCENTILE)
+    return jsonify({
+        "success": True,
+        "data": {
+            "catalog_replicas": catalog_selector.stats(),
+            "order_replicas": order_selector.stats(),
+            "hedge_delay_ms": round(max(hedge_delay, HEDGE_MIN_DELAY) * 1000, 2) if hedge_delay is not None else None,
+            "retry_budget": retry_budget.stats()
+        }
+    }), 200
+
+
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Counters summed over every worker; `segments` are the answering worker's."""
+    stats = publish_worker_stats()
+    totals = shared_stats.totals()
+    total_requests = totals['hits'] + totals['misses']
+    hit_rate = (totals['hits'] / total_requests * 100) if total_requests > 0 else 0
+    
+    return jsonify({
+        "success": True,
+        "data": {
+            "hits": totals['hits'],
+            "misses": totals['misses'],
+            "invalidations": totals['invalidations'],
+            "evictions": totals['evictions'],
+            "coalesced": totals['coalesced'],
+            "stale_served": totals['stale_served'],
+            "revalidated": totals['revalidated'],
+            "total_requests": total_requests,
+            "hit_rate_percent": round(hit_rate, 2),
+            "cache_size": totals['size'],
+            "max_cache_size": MAX_CACHE_SIZE,
+            "bytes_used": totals['bytes_used'],
+            "max_bytes": stats['max_bytes'],
+            "avg_entry_bytes": round(totals['bytes_used'] / totals['size'], 1) if totals['size'] else 0,
+            "policy": stats['policy'],
+            "workers": totals['workers'],
+            "worker_pid": os.getpid(),
+            "segments": stats['segments']
+        }
+    }), 200
+
+
+@app.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify({"success": True, "data": http_pool.stats()}), 200
 
 
 if __name__ == '__main__':
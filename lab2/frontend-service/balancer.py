@@ -0,0 +1,214 @@
+import logging
+import random
+import time
+from collections import deque
+from threading import Lock, Thread
+
+import requests
+
+import http_pool
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+ERROR_PENALTY = 10
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 5.0
+LATENCY_SAMPLES = 512
+
+
+class ReplicaState:
+    def __init__(self, url):
+        self.url = url
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def cost(self):
+        return (self.latency + 0.001) * (self.in_flight + 1) * (1 + ERROR_PENALTY * self.error_rate)
+
+    def stats(self, now):
+        if self.open_until > now:
+            circuit = 'open'
+        elif self.consecutive_failures >= FAILURE_THRESHOLD:
+            circuit = 'half-open'
+        else:
+            circuit = 'closed'
+        return {
+            "circuit": circuit,
+            "latency_ms": round(self.latency * 1000, 2),
+            "error_rate": round(self.error_rate, 3),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+class ReplicaSelector:
+    """Picks a replica of one service (`name`) by latency, load and health.
+
+    Each replica keeps an EWMA of its response time and error rate plus a
+    count of requests in flight. `acquire` samples two available replicas
+    and takes the cheaper one (power of two choices). After
+    FAILURE_THRESHOLD consecutive failures a replica's circuit opens for
+    OPEN_SECONDS; then a single trial request, or a successful health
+    probe, decides whether it closes again. If every circuit is open the
+    replica that is due soonest is tried anyway.
+    """
+
+    def __init__(self, urls, name='catalog', probe_path='/health', probe_interval=2.0, probe_timeout=1.0):
+        self.name = name
+        self.replicas = {url: ReplicaState(url) for url in urls}
+        self.lock = Lock()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.probe_path = probe_path
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.prober = Thread(target=self._probe_loop, name=f'{name}-prober', daemon=True)
+
+    def start(self):
+        self.prober.start()
+
+    def _available(self, replica, now):
+        if replica.open_until > now:
+            return False
+        if replica.consecutive_failures >= FAILURE_THRESHOLD:
+            return not replica.trial_in_flight
+        return True
+
+    def has_available(self, exclude=()):
+        """Whether a replica outside `exclude` can take a request right now."""
+        with self.lock:
+            now = time.monotonic()
+            return any(
+                self._available(replica, now)
+                for replica in self.replicas.values() if replica.url not in exclude
+            )
+
+    def acquire(self, exclude=()):
+        """Choose a replica not in `exclude` and count a request to it as in flight.
+
+        Returns None when every replica is excluded.
+        """
+        with self.lock:
+            now = time.monotonic()
+            replicas = [replica for replica in self.replicas.values() if replica.url not in exclude]
+            if not replicas:
+                return None
+            candidates = [replica for replica in replicas if self._available(replica, now)]
+            if not candidates:
+                replica = min(replicas, key=lambda replica: replica.open_until)
+            else:
+                sample = random.sample(candidates, min(2, len(candidates)))
+                replica = min(sample, key=ReplicaState.cost)
+            if replica.consecutive_failures >= FAILURE_THRESHOLD:
+                replica.trial_in_flight = True
+            replica.in_flight += 1
+            return replica.url
+
+    def release(self, url, latency, ok):
+        """Record the outcome of a request started with `acquire`."""
+        with self.lock:
+            replica = self.replicas[url]
+            replica.in_flight -= 1
+            replica.requests += 1
+            replica.trial_in_flight = False
+            self._observe(replica, latency, ok)
+            if ok:
+                self.latencies.append(latency)
+                self._close(replica)
+            else:
+                replica.failures += 1
+                self._record_failure(replica)
+
+    def latency_percentile(self, percentile, min_samples=20):
+        """Latency of successful requests at `percentile`, or None with too few samples."""
+        with self.lock:
+            samples = sorted(self.latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def _observe(self, replica, latency, ok):
+        replica.latency += EWMA_ALPHA * (latency - replica.latency)
+        replica.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - replica.error_rate)
+
+    def _close(self, replica):
+        if replica.consecutive_failures >= FAILURE_THRESHOLD:
+            logger.info(f"Circuit closed for {self.name} replica {replica.url}")
+        replica.consecutive_failures = 0
+        replica.open_until = 0.0
+
+    def _record_failure(self, replica):
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= FAILURE_THRESHOLD:
+            replica.open_until = time.monotonic() + OPEN_SECONDS
+            logger.warning(f"Circuit opened for {self.name} replica {replica.url} after {replica.consecutive_failures} failures")
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            for url in list(self.replicas):
+                start = time.monotonic()
+                try:
+                    ok = http_pool.get(f'{url}{self.probe_path}', timeout=self.probe_timeout).status_code == 200
+                except requests.exceptions.RequestException:
+                    ok = False
+                with self.lock:
+                    replica = self.replicas[url]
+                    # Probes keep the estimates current for replicas that get no traffic
+                    self._observe(replica, time.monotonic() - start, ok)
+                    if ok:
+                        self._close(replica)
+                    elif replica.open_until <= time.monotonic():
+                        self._record_failure(replica)
+
+    def stats(self):
+        with self.lock:
+            now = time.monotonic()
+            return {url: replica.stats(now) for url, replica in self.replicas.items()}
+
+
+class RetryBudget:
+    """Token bucket that caps retries and hedged requests at a fraction of traffic.
+
+    Every original request deposits `ratio` tokens (up to `max_tokens`) and
+    every extra attempt spends one, so during an outage extra load stays
+    around `ratio` of the incoming requests instead of multiplying it.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self.lock = Lock()
+        self.spent = {}
+        self.denied = 0
+
+    def deposit(self):
+        with self.lock:
+            # Rounded so that e.g. ten deposits of 0.1 add up to a whole token
+            self.tokens = min(self.max_tokens, round(self.tokens + self.ratio, 6))
+
+    def withdraw(self, kind):
+        with self.lock:
+            if self.tokens < 1:
+                self.denied += 1
+                return False
+            self.tokens -= 1
+            self.spent[kind] = self.spent.get(kind, 0) + 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                "tokens": round(self.tokens, 2),
+                "ratio": self.ratio,
+                "spent": dict(self.spent),
+                "denied": self.denied
+            }
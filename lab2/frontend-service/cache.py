@@ -0,0 +1,535 @@
+import fcntl
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+
+
+class LRUPolicy:
+    """Plain least-recently-used eviction.
+
+    Policies bound the total weight of their entries rather than the entry
+    count: the weight is 1 per entry in count mode and the entry's size in
+    byte-bounded mode.
+    """
+
+    name = 'lru'
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.weights = {}
+        self.weight = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, value, weight=1):
+        if weight > self.capacity:
+            # Could never fit: reject it (and drop any older copy) without evicting others
+            self.remove(key)
+            return [key]
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.weight -= self.weights[key]
+        self.entries[key] = value
+        self.weights[key] = weight
+        self.weight += weight
+        evicted = []
+        while self.weight > self.capacity and self.entries:
+            oldest_key, _ = self.entries.popitem(last=False)
+            self.weight -= self.weights.pop(oldest_key)
+            evicted.append(oldest_key)
+        return evicted
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is None:
+            return False
+        self.weight -= self.weights.pop(key)
+        return True
+
+
+class FrequencySketch:
+    """Count-min sketch of 4-bit counters that halves itself periodically.
+
+    Halving after `sample_size` increments ages out keys that were popular
+    once but are no longer requested.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        width = 16
+        while width < capacity * 4:
+            width *= 2
+        self.mask = width - 1
+        self.rows = [[0] * width for _ in range(self.DEPTH)]
+        self.sample_size = max(10 * capacity, 16)
+        self.additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        for row in range(self.DEPTH):
+            h = (h * 0x9E3779B1 + row) & 0xFFFFFFFFFFFF
+            yield row, (h >> 16) & self.mask
+
+    def frequency(self, key):
+        return min(self.rows[row][index] for row, index in self._indexes(key))
+
+    def increment(self, key):
+        for row, index in self._indexes(key):
+            if self.rows[row][index] < self.MAX_COUNT:
+                self.rows[row][index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for counters in self.rows:
+                for index, count in enumerate(counters):
+                    counters[index] = count >> 1
+            self.additions //= 2
+
+
+class WTinyLFUPolicy:
+    """Window TinyLFU: a small LRU window in front of a segmented LRU.
+
+    New keys enter the window. A key leaving the window competes with the
+    main area's LRU victim and is only admitted if the frequency sketch
+    says it is requested more often, so a one-off scan over cold keys
+    cannot flush frequently used entries out of the main area.
+    """
+
+    name = 'wtinylfu'
+    WINDOW_RATIO = 0.01
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.window_capacity = max(1, int(capacity * self.WINDOW_RATIO))
+        self.main_capacity = max(1, capacity - self.window_capacity)
+        self.protected_capacity = int(self.main_capacity * self.PROTECTED_RATIO)
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.weights = {}
+        self.window_weight = 0
+        self.protected_weight = 0
+        self.main_weight = 0
+        self.sketch = FrequencySketch(capacity)
+
+    def __len__(self):
+        return len(self.window) + len(self.probation) + len(self.protected)
+
+    def get(self, key):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+            return self.window[key]
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return self.protected[key]
+        if key in self.probation:
+            value = self.probation.pop(key)
+            self.protected[key] = value
+            self.protected_weight += self.weights[key]
+            while self.protected_weight > self.protected_capacity and len(self.protected) > 1:
+                demoted_key, demoted_value = self.protected.popitem(last=False)
+                self.protected_weight -= self.weights[demoted_key]
+                self.probation[demoted_key] = demoted_value
+            return value
+        return None
+
+    def peek(self, key):
+        for area in (self.window, self.probation, self.protected):
+            if key in area:
+                return area[key]
+        return None
+
+    def put(self, key, value, weight=1):
+        if weight > self.main_capacity:
+            # As in _admit: too heavy to ever be admitted, so no one else is evicted for it
+            self.remove(key)
+            return [key]
+        if key in self.weights and key not in self.window:
+            return self._update_main(key, value, weight)
+        if key in self.weights:
+            self.window_weight -= self.weights[key]
+            self.window.move_to_end(key)
+
+        self.window[key] = value
+        self.weights[key] = weight
+        self.window_weight += weight
+        evicted = []
+        while self.window_weight > self.window_capacity and self.window:
+            candidate_key, candidate_value = self.window.popitem(last=False)
+            self.window_weight -= self.weights[candidate_key]
+            evicted.extend(self._admit(candidate_key, candidate_value))
+        return evicted
+
+    def _update_main(self, key, value, weight):
+        """Replace a main-area entry in place, keeping its earned position."""
+        delta = weight - self.weights[key]
+        self.weights[key] = weight
+        self.main_weight += delta
+        if key in self.protected:
+            self.protected[key] = value
+            self.protected.move_to_end(key)
+            self.protected_weight += delta
+        else:
+            self.probation[key] = value
+            self.probation.move_to_end(key)
+
+        evicted = []
+        while self.main_weight > self.main_capacity:
+            victim_key = next(iter(self.probation or self.protected))
+            self.remove(victim_key)
+            evicted.append(victim_key)
+        return evicted
+
+    def _admit(self, candidate_key, candidate_value):
+        """Move a key leaving the window into probation if it beats the victims."""
+        candidate_weight = self.weights[candidate_key]
+        candidate_frequency = self.sketch.frequency(candidate_key)
+        if candidate_weight > self.main_capacity:
+            del self.weights[candidate_key]
+            return [candidate_key]
+
+        victims = []
+        freed = 0
+        areas = [self.probation, self.protected]
+        keys = (key for area in areas for key in area)
+        while self.main_weight - freed + candidate_weight > self.main_capacity:
+            victim_key = next(keys)
+            if self.sketch.frequency(victim_key) >= candidate_frequency:
+                del self.weights[candidate_key]
+                return [candidate_key]
+            victims.append(victim_key)
+            freed += self.weights[victim_key]
+
+        for victim_key in victims:
+            self.remove(victim_key)
+        self.probation[candidate_key] = candidate_value
+        self.main_weight += candidate_weight
+        return victims
+
+    def remove(self, key):
+        weight = self.weights.pop(key, None)
+        if weight is None:
+            return False
+        if self.window.pop(key, None) is not None:
+            self.window_weight -= weight
+            return True
+        if self.protected.pop(key, None) is not None:
+            self.protected_weight -= weight
+        else:
+            self.probation.pop(key)
+        self.main_weight -= weight
+        return True
+
+
+POLICIES = {policy.name: policy for policy in (LRUPolicy, WTinyLFUPolicy)}
+
+
+class CacheSegment:
+    """One hash partition of the cache: its own lock, policy and counters.
+
+    Entry sizes are always tracked for memory accounting; when `by_bytes`
+    is set they are also the weights the policy bounds by `capacity`.
+    """
+
+    def __init__(self, capacity, policy='lru', by_bytes=False):
+        self.capacity = capacity
+        self.by_bytes = by_bytes
+        self.lock = Lock()
+        self.policy = POLICIES[policy](capacity)
+        self.sizes = {}
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.policy.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size):
+        with self.lock:
+            return self._put(key, value, size)
+
+    def update(self, key, fn):
+        """Atomically replace key's value with fn(current value or None).
+
+        fn returns a (value, size) pair to store, or None to leave the
+        entry as it is. Looking at the current value does not count as an
+        access.
+        """
+        with self.lock:
+            result = fn(self.policy.peek(key))
+            if result is None:
+                return []
+            return self._put(key, *result)
+
+    def _put(self, key, value, size):
+        self.bytes_used += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+        evicted = self.policy.put(key, value, size if self.by_bytes else 1)
+        for evicted_key in evicted:
+            self.bytes_used -= self.sizes.pop(evicted_key)
+        self.evictions += len(evicted)
+        return evicted
+
+    def invalidate(self, key):
+        with self.lock:
+            if not self.policy.remove(key):
+                return False
+            self.bytes_used -= self.sizes.pop(key)
+            self.invalidations += 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "size": len(self.policy),
+                "capacity": self.capacity,
+                "bytes_used": self.bytes_used
+            }
+
+
+class SegmentedCache:
+    """Cache split into hash-partitioned segments.
+
+    Each key lives in exactly one segment, so concurrent requests only
+    contend when their keys hash to the same segment. Capacity is divided
+    evenly, which makes the total bound approximate (rounded up per segment).
+    `policy` selects eviction/admission per segment: 'lru' or 'wtinylfu'.
+    With `max_bytes` the cache is bounded by the total size of the cached
+    payloads instead of by `max_size` entries.
+    """
+
+    def __init__(self, max_size, segments=16, policy='lru', max_bytes=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.policy = policy
+        limit = max_bytes if max_bytes else max_size
+        capacity = max(1, -(-limit // segments))
+        self.segments = [CacheSegment(capacity, policy, by_bytes=bool(max_bytes)) for _ in range(segments)]
+
+    def segment_for(self, key):
+        return self.segments[hash(key) % len(self.segments)]
+
+    def get(self, key):
+        return self.segment_for(key).get(key)
+
+    def put(self, key, value, size=0):
+        return self.segment_for(key).put(key, value, size)
+
+    def update(self, key, fn):
+        return self.segment_for(key).update(key, fn)
+
+    def invalidate(self, key):
+        return self.segment_for(key).invalidate(key)
+
+    def stats(self):
+        segments = [segment.stats() for segment in self.segments]
+        totals = {
+            name: sum(segment[name] for segment in segments)
+            for name in ("hits", "misses", "invalidations", "evictions", "size", "bytes_used")
+        }
+        totals["avg_entry_bytes"] = round(totals["bytes_used"] / totals["size"], 1) if totals["size"] else 0
+        totals["max_bytes"] = self.max_bytes
+        totals["policy"] = self.policy
+        totals["segments"] = segments
+        return totals
+
+
+class _Call:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and share its result (or exception) instead of
+    repeating the work.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._run(key, call, fn)
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do_in_background(self, key, fn):
+        """Run fn on a background thread unless a call for key is already in flight."""
+        with self.lock:
+            if key in self.calls:
+                return False
+            call = self.calls[key] = _Call()
+        Thread(target=self._run, args=(key, call, fn), daemon=True).start()
+        return True
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+class SharedEpochs:
+    """Per-key change counters shared by every worker process of the frontend.
+
+    Keys hash into `slots` 8-byte counters in a memory-mapped file. Whoever
+    learns that a key changed bumps its counter; a cached entry remembers
+    the counter it was fetched under and is stale once the counter moved,
+    so an invalidation that reaches one worker reaches them all. Colliding
+    keys only cause extra misses. Each process must open the file itself
+    (not inherit it across fork), since the flock that serializes bumps is
+    held per open file.
+    """
+
+    def __init__(self, path, slots=4096):
+        self.slots = slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < slots * 8:
+            os.ftruncate(self.fd, slots * 8)
+        self.map = mmap.mmap(self.fd, slots * 8)
+        self.lock = Lock()
+
+    def _offset(self, key):
+        return zlib.crc32(key.encode()) % self.slots * 8
+
+    def get(self, key):
+        return struct.unpack_from('Q', self.map, self._offset(key))[0]
+
+    def bump(self, key):
+        """Advance key's counter and return the new value."""
+        offset = self._offset(key)
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                value = struct.unpack_from('Q', self.map, offset)[0] + 1
+                struct.pack_into('Q', self.map, offset, value)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return value
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedCounters:
+    """Statistics of every worker process of the frontend, in a memory-mapped file.
+
+    Each worker claims a row of 8-byte values when it opens the file and is
+    the only process writing that row, so updates need only an in-process
+    lock. `totals` sums all rows. Counters (`add`) of workers that have
+    exited still count, while `gauges` (`set`) only count for live workers.
+    A new worker takes a free row, or a dead worker's row once none is free,
+    and keeps adding to the counts already in it.
+    """
+
+    def __init__(self, path, counters, gauges=(), rows=64):
+        self.names = list(counters) + list(gauges)
+        self.gauges = set(gauges)
+        self.fields = {name: (index + 1) * 8 for index, name in enumerate(self.names)}
+        self.row_size = (len(self.names) + 1) * 8
+        self.rows = rows
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < rows * self.row_size:
+            os.ftruncate(self.fd, rows * self.row_size)
+        self.map = mmap.mmap(self.fd, rows * self.row_size)
+        self.lock = Lock()
+        self.base = self._claim_row() * self.row_size
+
+    def _claim_row(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            pids = [struct.unpack_from('Q', self.map, row * self.row_size)[0] for row in range(self.rows)]
+            free = [row for row, pid in enumerate(pids) if pid == 0]
+            dead = [row for row, pid in enumerate(pids) if pid and not _process_alive(pid)]
+            # With every row held by a live worker the last one is shared (counts stay approximate)
+            row = (free or dead or [self.rows - 1])[0]
+            struct.pack_into('Q', self.map, row * self.row_size, os.getpid())
+            for name in self.gauges:
+                struct.pack_into('Q', self.map, row * self.row_size + self.fields[name], 0)
+            return row
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def add(self, name, amount=1):
+        offset = self.base + self.fields[name]
+        with self.lock:
+            struct.pack_into('Q', self.map, offset, struct.unpack_from('Q', self.map, offset)[0] + amount)
+
+    def set(self, name, value):
+        with self.lock:
+            struct.pack_into('Q', self.map, self.base + self.fields[name], value)
+
+    def totals(self):
+        """Sum over all workers, plus the number of live workers as `workers`."""
+        totals = dict.fromkeys(self.names, 0)
+        totals["workers"] = 0
+        for row in range(self.rows):
+            pid, *values = struct.unpack_from(f'{len(self.names) + 1}Q', self.map, row * self.row_size)
+            if pid == 0:
+                continue
+            alive = _process_alive(pid)
+            totals["workers"] += alive
+            for name, value in zip(self.names, values):
+                if alive or name not in self.gauges:
+                    totals[name] += value
+        return totals
@@ -0,0 +1,42 @@
+"""Gunicorn settings for the frontend: `gunicorn app:app` (see README).
+
+Each worker process has its own cache, connection pools and replica
+statistics; changes to cached keys reach every worker through the shared
+epoch file (CACHE_EPOCH_FILE), which the master creates for its workers.
+"""
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '80')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_WORKERS', str(min(os.cpu_count() or 1, 4))))
+threads = int(os.getenv('WEB_THREADS', '8'))
+# Idle client connections stay open this many seconds for the next request
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+# On SIGTERM a worker stops accepting and finishes in-flight requests for up to this long
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '10'))
+# Each worker imports the app itself so its background threads run in the worker
+preload_app = False
+
+# Set when the master created the epoch file itself, so it removes it on exit
+epoch_file = None
+
+
+def on_starting(server):
+    # A fresh file per master: a second frontend on the host, or counters
+    # left behind by an earlier run, must not share epochs with these workers
+    global epoch_file
+    if os.getenv('CACHE_EPOCH_FILE'):
+        return
+    fd, epoch_file = tempfile.mkstemp(prefix='bazar-frontend-cache-epochs-')
+    os.close(fd)
+    os.environ['CACHE_EPOCH_FILE'] = epoch_file
+
+
+def on_exit(server):
+    if epoch_file:
+        os.remove(epoch_file)
+        # Opened by the workers next to the epoch file (see open_shared in app.py)
+        if os.path.exists(f"{epoch_file}.stats"):
+            os.remove(f"{epoch_file}.stats")
@@ -1,7 +1,22 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+import http_pool
 from service import OrderService
+import sync
 
 app = Flask(__name__)
+sync.start(OrderService)
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        "success": True,
+        "data": {
+            "last_order_id": OrderService.last_order_id(),
+            "partition": sync.PARTITION,
+            "partitions": sync.PARTITIONS
+        }
+    }), 200
 
 
 @app.route('/buy/<int:book_id>', methods=['POST'])
@@ -13,5 +28,66 @@ def buy(book_id):
         return jsonify({"success": False, "message": message}), status_code
 
 
+@app.route('/sync', methods=['POST'])
+def sync_endpoint():
+    try:
+        data = request.get_json()
+        if not data or 'order' not in data:
+            return jsonify({"success": False, "message": "Missing order data"}), 400
+        
+        order_data = data['order']
+        success, message = sync.apply_sync(OrderService, order_data)
+        
+        if success:
+            return jsonify({"success": True, "message": message}), 200
+        else:
+            return jsonify({"success": False, "message": message}), 400
+    
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Sync error: {str(e)}"}), 500
+
+
+@app.route('/sync/batch', methods=['POST'])
+def sync_batch_endpoint():
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('orders'), list):
+            return jsonify({"success": False, "message": "Missing 'orders' list in request body"}), 400
+        
+        success, message, last_order_id = sync.apply_batch(OrderService, data['orders'])
+        
+        if success:
+            return jsonify({"success": True, "message": message, "last_order_id": last_order_id}), 200
+        else:
+            return jsonify({"success": False, "message": message}), 400
+    
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Sync error: {str(e)}"}), 500
+
+
+@app.route('/orders', methods=['GET'])
+def list_orders():
+    after_id = request.args.get('after', default=0, type=int)
+    limit = max(1, min(request.args.get('limit', default=50, type=int), 500))
+    partition = request.args.get('partition', type=int)
+    orders = OrderService.list_orders(after_id, limit, partition)
+    next_after = orders[-1]["order_id"] if len(orders) == limit else None
+    return jsonify({"success": True, "data": orders, "next_after": next_after}), 200
+
+
+@app.route('/orders/<int:order_id>', methods=['GET'])
+def get_order(order_id):
+    order = OrderService.get_order(order_id)
+    if order:
+        return jsonify({"success": True, "data": order}), 200
+    else:
+        return jsonify({"success": False, "message": "Order not found"}), 404
+
+
+@app.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify({"success": True, "data": http_pool.stats()}), 200
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8081)
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from itertools import islice
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+ORDER_ID_BLOCK = int(os.getenv('ORDER_ID_BLOCK', '100'))
+TAIL_SIZE = int(os.getenv('ORDER_LEDGER_TAIL_SIZE', '256'))
+
+
+class OrderLedger:
+    """Append-only JSON-lines order log with a persisted order_id counter.
+
+    Only byte offsets are indexed in memory (plus a small tail of recent
+    orders), so recording a purchase is one append regardless of history.
+    Order ids are reserved from `<ledger>.counter` in blocks of
+    ORDER_ID_BLOCK, so ids stay monotonic across restarts even if the last
+    append was lost; unused ids of a reserved block are skipped.
+
+    With several replicas creating orders, each allocates only the ids of
+    its own `partition` (ids where (id - 1) % partitions == partition), so
+    ids never collide and replicated orders can be appended as they are.
+    """
+
+    def __init__(self, ledger_file, legacy_file=None, partition=0, partitions=1):
+        self.ledger_file = ledger_file
+        self.partition = partition
+        self.partitions = partitions
+        self.counter_file = f"{os.path.splitext(ledger_file)[0]}.counter"
+        self.lock = Lock()
+        self.offsets = {}
+        self.order_ids = []
+        self.tail = OrderedDict()
+        
+        if not os.path.exists(ledger_file):
+            self._migrate(legacy_file)
+        self._build_index()
+        
+        self.reserved_id = self._read_counter()
+        last_id = self.order_ids[-1] if self.order_ids else 0
+        self.next_id = max(self.reserved_id, last_id) + 1
+        self.reserved_id = max(self.reserved_id, last_id)
+        self.file = open(ledger_file, 'ab')
+        self.reader = open(ledger_file, 'rb')
+
+    def _migrate(self, legacy_file):
+        orders = []
+        if legacy_file and os.path.exists(legacy_file):
+            with open(legacy_file, 'r') as f:
+                orders = json.load(f)
+            logger.info(f"Migrating {len(orders)} orders from {legacy_file}")
+        tmp_file = f"{self.ledger_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            for order in orders:
+                f.write(self._encode(order))
+        os.replace(tmp_file, self.ledger_file)
+
+    def _build_index(self):
+        offset = 0
+        with open(self.ledger_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logger.warning(f"Dropping torn ledger tail in {self.ledger_file}")
+                    os.truncate(self.ledger_file, offset)
+                    break
+                order = json.loads(line)
+                self._index(order, offset)
+                offset += len(line)
+
+    def _index(self, order, offset):
+        order_id = order["order_id"]
+        self.offsets[order_id] = offset
+        if not self.order_ids or order_id > self.order_ids[-1]:
+            self.order_ids.append(order_id)
+        else:
+            insort(self.order_ids, order_id)
+        self.tail[order_id] = order
+        if len(self.tail) > TAIL_SIZE:
+            self.tail.popitem(last=False)
+
+    def _read_counter(self):
+        try:
+            with open(self.counter_file, 'r') as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_counter(self, value):
+        tmp_file = f"{self.counter_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(str(value))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.counter_file)
+
+    @staticmethod
+    def _encode(order):
+        return (json.dumps(order, separators=(',', ':')) + '\n').encode()
+
+    def partition_of(self, order_id):
+        return (order_id - 1) % self.partitions
+
+    def _allocate_id(self):
+        # Next id of our partition; replicated orders may have moved next_id anywhere
+        self.next_id += (self.partition - self.partition_of(self.next_id)) % self.partitions
+        if self.next_id > self.reserved_id:
+            self.reserved_id = self.next_id + ORDER_ID_BLOCK * self.partitions - 1
+            self._write_counter(self.reserved_id)
+        order_id = self.next_id
+        self.next_id += self.partitions
+        return order_id
+
+    def create(self, **fields):
+        """Allocate the next order_id and append the order in one step."""
+        with self.lock:
+            order = {"order_id": self._allocate_id(), **fields}
+            offset = self.file.tell()
+            self.file.write(self._encode(order))
+            self.file.flush()
+            self._index(order, offset)
+            return order
+
+    def add(self, order):
+        """Append an order that already has an id (replication); False if present."""
+        return self.add_many([order]) == 1
+
+    def add_many(self, orders):
+        """Append replicated orders not yet in the ledger with a single flush.
+
+        Returns how many were new; duplicates are detected through the id index.
+        """
+        added = 0
+        with self.lock:
+            for order in orders:
+                order_id = order["order_id"]
+                if order_id in self.offsets:
+                    continue
+                offset = self.file.tell()
+                self.file.write(self._encode(order))
+                self._index(order, offset)
+                if order_id >= self.next_id:
+                    self.next_id = order_id + 1
+                added += 1
+            if added:
+                self.file.flush()
+        return added
+
+    def get(self, order_id):
+        with self.lock:
+            order = self.tail.get(order_id)
+            if order is not None:
+                return order
+            offset = self.offsets.get(order_id)
+            if offset is None:
+                return None
+            self.reader.seek(offset)
+            return json.loads(self.reader.readline())
+
+    def page(self, after_id=0, limit=50, partition=None):
+        """Up to `limit` orders after `after_id`, optionally only those of one partition."""
+        with self.lock:
+            start = bisect_right(self.order_ids, after_id)
+            if partition is None:
+                order_ids = self.order_ids[start:start + limit]
+            else:
+                order_ids = []
+                for order_id in islice(self.order_ids, start, None):
+                    if self.partition_of(order_id) == partition:
+                        order_ids.append(order_id)
+                        if len(order_ids) == limit:
+                            break
+        return [self.get(order_id) for order_id in order_ids]
+
+    def all(self):
+        with self.lock:
+            order_ids = list(self.order_ids)
+        return [self.get(order_id) for order_id in order_ids]
+
+    def last_id(self):
+        with self.lock:
+            return self.order_ids[-1] if self.order_ids else 0
@@ -1,70 +1,88 @@
-import json
 import os
 import requests
 from datetime import datetime
-from threading import Lock
+from ledger import OrderLedger
+import http_pool
+import lease
 import sync
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'orders.json')
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+LEGACY_DATA_FILE = os.path.join(DATA_DIR, 'orders.json')
+LEDGER_FILE = os.path.join(DATA_DIR, 'orders.jsonl')
 CATALOG_SERVICE_URL = os.getenv('CATALOG_SERVICE_URL', 'http://catalog-replica-1:8080')
-data_lock = Lock()
+ledger = OrderLedger(LEDGER_FILE, legacy_file=LEGACY_DATA_FILE, partition=sync.PARTITION, partitions=sync.PARTITIONS)
+catalog_primary = lease.LeaderLookup('catalog', CATALOG_SERVICE_URL)
 
 
 class OrderService:
     @staticmethod
     def load_orders():
-        with data_lock:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
+        return ledger.all()
     
     @staticmethod
-    def save_orders(orders):
-        with data_lock:
-            with open(DATA_FILE, 'w') as f:
-                json.dump(orders, f, indent=2)
+    def get_order(order_id):
+        return ledger.get(order_id)
+    
+    @staticmethod
+    def list_orders(after_id=0, limit=50, partition=None):
+        return ledger.page(after_id, limit, partition)
+    
+    @staticmethod
+    def record_order(order):
+        return ledger.add(order)
+    
+    @staticmethod
+    def record_orders(orders):
+        return ledger.add_many(orders)
+    
+    @staticmethod
+    def last_order_id():
+        return ledger.last_id()
+    
+    @staticmethod
+    def catalog_purchase(book_id):
+        """POST the purchase to the catalog primary.
+
+        A 503 means the node is not (or no longer) primary and did nothing,
+        so the purchase is retried once on the primary the coordinator
+        names now.
+        """
+        response = http_pool.post(f'{catalog_primary.url()}/purchase/{book_id}')
+        if response.status_code == 503:
+            response = http_pool.post(f'{catalog_primary.refresh()}/purchase/{book_id}')
+        return response
     
     @staticmethod
     def process_purchase(book_id):
         try:
-            decrement_response = requests.post(
-                f'{CATALOG_SERVICE_URL}/decrement/{book_id}',
-                timeout=5
-            )
+            purchase_response = OrderService.catalog_purchase(book_id)
             
-            if decrement_response.status_code == 200:
-                info_response = requests.get(
-                    f'{CATALOG_SERVICE_URL}/info/{book_id}',
-                    timeout=5
-                )
+            if purchase_response.status_code == 200:
+                book_data = purchase_response.json().get('data') or {}
+                book_title = book_data.get('title', 'Unknown')
                 
-                if info_response.status_code == 200:
-                    book_data = info_response.json().get('data', {})
-                    book_title = book_data.get('title', 'Unknown')
-                else:
-                    book_title = 'Unknown'
-                
-                orders = OrderService.load_orders()
-                order = {
-                    "order_id": len(orders) + 1,
-                    "book_id": book_id,
-                    "book_title": book_title,
-                    "timestamp": datetime.now().isoformat()
-                }
-                orders.append(order)
-                OrderService.save_orders(orders)
+                order = ledger.create(
+                    book_id=book_id,
+                    book_title=book_title,
+                    timestamp=datetime.now().isoformat()
+                )
                 
                 sync.propagate_order(order)
                 
                 return True, f"bought book {book_title}", 200
             
-            elif decrement_response.status_code == 400:
+            elif purchase_response.status_code == 400:
                 return False, "Book out of stock", 400
             
-            elif decrement_response.status_code == 404:
+            elif purchase_response.status_code == 404:
                 return False, "Book not found", 404
             
+            elif purchase_response.status_code == 503:
+                return False, "Catalog primary unavailable", 503
+            
             else:
                 return False, "Failed to process order", 500
         
         except requests.exceptions.RequestException as e:
+            catalog_primary.refresh()
             return False, f"Service communication error: {str(e)}", 503
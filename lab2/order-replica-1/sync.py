@@ -1,41 +1,173 @@
 import requests
 import logging
+import http_pool
 import os
+from collections import deque
+from threading import Condition, Thread
 from time import sleep
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-REPLICA_2_URL = os.getenv('ORDER_REPLICA_2_URL', 'http://order-replica-2:8083')
-MAX_RETRIES = 3
+# Both replicas take purchases; each creates the order ids of its own partition
+PARTITIONS = 2
+PARTITION = int(os.getenv('ORDER_PARTITION', '0'))
+PEER_PARTITION = int(os.getenv('ORDER_PEER_PARTITION', '1'))
+PEER_URL = os.getenv('ORDER_REPLICA_2_URL', 'http://order-replica-2:8083')
+WATERMARK_FILE = os.path.join(os.path.dirname(__file__), 'data', 'orders.synced')
+CATCH_UP_INTERVAL = float(os.getenv('ORDER_CATCH_UP_INTERVAL', '30'))
+CATCH_UP_PAGE_SIZE = 500
+PUSH_BATCH_SIZE = 100
+# Orders waiting to be pushed while the peer is slow; the oldest are dropped beyond this
+MAX_PENDING_PUSHES = 10000
 RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 10
+
+
+class OrderPushQueue:
+    """Pushes new orders to the peer in the background, off the request path.
+
+    Each batch gets a single attempt. Orders the peer does not take are
+    dropped here and pulled by the peer's catch-up instead, which never
+    skips an order that was not pulled.
+    """
+
+    def __init__(self):
+        self.cond = Condition()
+        self.pending = deque(maxlen=MAX_PENDING_PUSHES)
+        self.worker = Thread(target=self._run, name='order-push', daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def push(self, order):
+        with self.cond:
+            self.pending.append(order)
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch = [self.pending.popleft() for _ in range(min(PUSH_BATCH_SIZE, len(self.pending)))]
+            send_orders(batch)
+
+
+def send_orders(orders):
+    try:
+        response = http_pool.post(f'{PEER_URL}/sync/batch', json={'orders': orders})
+        if response.status_code == 200:
+            logger.info(f"Pushed {len(orders)} orders to peer, up to order {orders[-1]['order_id']}")
+            return True
+        logger.warning(f"Peer returned status {response.status_code}; {len(orders)} orders left to its catch-up")
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Failed to push {len(orders)} orders to peer, left to its catch-up: {str(e)}")
+    return False
+
+
+push_queue = None
 
 
 def propagate_order(order_data):
-    payload = {
-        'order': order_data
-    }
+    """Queue a new order for the peer; returns without waiting for it."""
+    push_queue.push(order_data)
+
+
+def apply_sync(service_class, order_data):
+    try:
+        order_id = order_data.get('order_id')
+        if not service_class.record_order(order_data):
+            logger.info(f"Order {order_id} already exists, skipping")
+            return True, "Order already synced"
+        
+        logger.info(f"Synced order {order_id}")
+        return True, "Sync successful"
     
-    for attempt in range(MAX_RETRIES):
+    except Exception as e:
+        logger.error(f"Error applying sync: {str(e)}")
+        return False, f"Sync error: {str(e)}"
+
+
+def apply_batch(service_class, orders):
+    try:
+        orders = sorted(orders, key=lambda order: order["order_id"])
+        added = service_class.record_orders(orders)
+        last_id = service_class.last_order_id()
+        logger.info(f"Synced {added} of {len(orders)} orders, last order id {last_id}")
+        return True, f"Synced {added} of {len(orders)} orders", last_id
+    
+    except (KeyError, TypeError) as e:
+        logger.error(f"Error applying sync: {str(e)}")
+        return False, f"Sync error: {str(e)}", None
+
+
+def read_watermark():
+    try:
+        with open(WATERMARK_FILE, 'r') as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(order_id):
+    tmp_file = f"{WATERMARK_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(str(order_id))
+    os.replace(tmp_file, WATERMARK_FILE)
+
+
+def catch_up(service_class):
+    """Page through the peer's own orders after the last id we pulled.
+
+    Only the peer's partition is pulled: a replica allocates its ids in
+    increasing order, so the watermark never passes one of its orders that
+    has not been written yet. The watermark only advances through pulls, so
+    an order whose push was lost is still fetched even if later orders were
+    pushed successfully.
+    """
+    after_id = read_watermark()
+    start_id = after_id
+    while True:
+        response = http_pool.get(
+            f'{PEER_URL}/orders',
+            params={'after': after_id, 'limit': CATCH_UP_PAGE_SIZE, 'partition': PEER_PARTITION}
+        )
+        response.raise_for_status()
+        payload = response.json()
+        orders = payload.get('data', [])
+        if orders:
+            success, message, _ = apply_batch(service_class, orders)
+            if not success:
+                raise ValueError(message)
+            after_id = orders[-1]['order_id']
+            write_watermark(after_id)
+        if payload.get('next_after') is None:
+            break
+    
+    if after_id > start_id:
+        logger.info(f"Caught up peer orders {start_id + 1}..{after_id}")
+
+
+def run_catch_up(service_class):
+    failures = 0
+    while True:
         try:
-            logger.info(f"Propagating order {order_data.get('order_id')} to replica-2 (attempt {attempt + 1})")
-            response = requests.post(
-                f'{REPLICA_2_URL}/sync',
-                json=payload,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Successfully propagated order {order_data.get('order_id')}")
-                return True
-            else:
-                logger.warning(f"Replica-2 returned status {response.status_code}")
-        
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to propagate to replica-2: {str(e)}")
+            catch_up(service_class)
+            failures = 0
+        except (requests.exceptions.RequestException, ValueError) as e:
+            failures += 1
+            logger.warning(f"Order catch-up with peer failed: {str(e)}")
+            sleep(min(RETRY_DELAY * (2 ** (failures - 1)), MAX_RETRY_DELAY))
+            continue
         
-        if attempt < MAX_RETRIES - 1:
-            sleep(RETRY_DELAY * (2 ** attempt))
-    
-    logger.error(f"Failed to propagate order {order_data.get('order_id')} after {MAX_RETRIES} attempts")
-    return False
+        if CATCH_UP_INTERVAL <= 0:
+            return
+        sleep(CATCH_UP_INTERVAL)
+
+
+def start(service_class):
+    global push_queue
+    push_queue = OrderPushQueue()
+    push_queue.start()
+    Thread(target=run_catch_up, args=(service_class,), name='order-catch-up', daemon=True).start()
@@ -0,0 +1,143 @@
+"""
+Concurrency stress test for Lab 2
+Fires many simultaneous purchases and checks that no decrement is lost or oversold
+"""
+import requests
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "http://localhost:9000"
+CATALOG_PRIMARY_URL = "http://localhost:9080"
+
+THREADS = 64
+STOCK_PER_BOOK = 100
+EXTRA_REQUESTS = 50
+
+
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+
+def print_test(test_name):
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}TEST: {test_name}{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}")
+
+
+def print_success(message):
+    print(f"{GREEN}[OK] {message}{RESET}")
+
+
+def print_error(message):
+    print(f"{RED}[FAIL] {message}{RESET}")
+
+
+def print_info(message):
+    print(f"{YELLOW}[INFO] {message}{RESET}")
+
+
+def get_quantity(book_id):
+    response = requests.get(f"{CATALOG_PRIMARY_URL}/info/{book_id}")
+    return response.json().get('data', {}).get('quantity')
+
+
+def set_stock(book_id, quantity):
+    change = quantity - get_quantity(book_id)
+    if change:
+        requests.put(
+            f"{BASE_URL}/update/{book_id}/stock",
+            json={"quantity_change": change},
+            headers={'Content-Type': 'application/json'}
+        )
+
+
+def buy(book_id):
+    response = requests.post(f"{BASE_URL}/buy/{book_id}")
+    return book_id, response.status_code
+
+
+def run_burst(book_ids):
+    """Buy every book STOCK_PER_BOOK + EXTRA_REQUESTS times from THREADS threads."""
+    for book_id in book_ids:
+        set_stock(book_id, STOCK_PER_BOOK)
+
+    jobs = [book_id for _ in range(STOCK_PER_BOOK + EXTRA_REQUESTS) for book_id in book_ids]
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(buy, jobs))
+    elapsed = time.time() - start
+
+    print_info(f"{len(jobs)} purchases from {THREADS} threads in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} req/s)")
+    return Counter(results)
+
+
+def check_book(book_id, results):
+    ok = True
+    sold = results[(book_id, 200)]
+    rejected = results[(book_id, 400)]
+    remaining = get_quantity(book_id)
+
+    if sold == STOCK_PER_BOOK:
+        print_success(f"Book {book_id}: exactly {sold} purchases succeeded")
+    else:
+        print_error(f"Book {book_id}: {sold} purchases succeeded, expected {STOCK_PER_BOOK}")
+        ok = False
+
+    if rejected == EXTRA_REQUESTS:
+        print_success(f"Book {book_id}: {rejected} purchases rejected as out of stock")
+    else:
+        print_error(f"Book {book_id}: {rejected} out-of-stock rejections, expected {EXTRA_REQUESTS}")
+        ok = False
+
+    if remaining == 0:
+        print_success(f"Book {book_id}: stock ends at 0, no lost decrements")
+    else:
+        print_error(f"Book {book_id}: stock ends at {remaining}, expected 0")
+        ok = False
+    return ok
+
+
+def test_same_book():
+
+    print_test("Concurrent Purchases of One Book")
+
+    results = run_burst([7])
+    return check_book(7, results)
+
+
+def test_different_books():
+
+    print_test("Concurrent Purchases Across Books")
+
+    book_ids = [4, 5, 6, 7]
+    results = run_burst(book_ids)
+    return all([check_book(book_id, results) for book_id in book_ids])
+
+
+def main():
+    print(f"\n{BLUE}{'='*60}{RESET}")
+    print(f"{BLUE}Lab 2: Bazar Concurrency Stress Test{RESET}")
+    print(f"{BLUE}{'='*60}{RESET}")
+
+    try:
+        passed = test_same_book()
+        passed = test_different_books() and passed
+    except requests.exceptions.ConnectionError:
+        print_error("Cannot connect to the service. Make sure Docker containers are running:")
+        print_info("Run: cd lab2 && docker-compose up")
+        sys.exit(1)
+
+    if passed:
+        print(f"\n{GREEN}All concurrency checks passed!{RESET}\n")
+    else:
+        print(f"\n{RED}Concurrency checks failed{RESET}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
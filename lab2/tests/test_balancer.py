@@ -0,0 +1,121 @@
+"""
+Unit tests for the frontend's replica selector and retry budget (frontend-service)
+
+Run from lab2: python -m pytest tests
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'frontend-service'))
+
+import balancer
+from balancer import FAILURE_THRESHOLD, OPEN_SECONDS, ReplicaSelector, RetryBudget
+
+A = 'http://replica-a'
+B = 'http://replica-b'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(balancer, 'time', SimpleNamespace(monotonic=clock.monotonic, sleep=time.sleep))
+    return clock
+
+
+def fail(selector, url, times=FAILURE_THRESHOLD):
+    for _ in range(times):
+        assert selector.acquire(exclude=[other for other in selector.replicas if other != url]) == url
+        selector.release(url, 0.01, False)
+
+
+def circuit(selector, url):
+    return selector.stats()[url]["circuit"]
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    selector = ReplicaSelector([A, B])
+    fail(selector, A, FAILURE_THRESHOLD - 1)
+    assert circuit(selector, A) == 'closed'
+
+    fail(selector, A, 1)
+
+    assert circuit(selector, A) == 'open'
+    assert not selector.has_available(exclude=[B])
+    assert all(selector.acquire() == B for _ in range(10))
+
+
+def test_half_open_circuit_allows_one_trial_that_closes_it(clock):
+    selector = ReplicaSelector([A, B])
+    fail(selector, A)
+    clock.now += OPEN_SECONDS + 0.1
+    assert circuit(selector, A) == 'half-open'
+
+    assert selector.acquire(exclude=[B]) == A
+    # Only one trial request at a time
+    assert not selector.has_available(exclude=[B])
+    selector.release(A, 0.01, True)
+
+    assert circuit(selector, A) == 'closed'
+    assert selector.has_available(exclude=[B])
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    selector = ReplicaSelector([A, B])
+    fail(selector, A)
+    clock.now += OPEN_SECONDS + 0.1
+
+    fail(selector, A, 1)
+
+    assert circuit(selector, A) == 'open'
+    assert selector.replicas[A].open_until == clock.now + OPEN_SECONDS
+
+
+def test_when_every_circuit_is_open_the_soonest_due_is_tried(clock):
+    selector = ReplicaSelector([A, B])
+    fail(selector, A)
+    clock.now += 1
+    fail(selector, B)
+
+    assert selector.acquire() == A
+
+
+def test_retry_budget_starts_full_and_runs_dry():
+    budget = RetryBudget(ratio=0.1, max_tokens=3)
+
+    assert [budget.withdraw('retry') for _ in range(4)] == [True, True, True, False]
+    assert budget.stats()["spent"] == {"retry": 3}
+    assert budget.stats()["denied"] == 1
+
+
+def test_retry_budget_refills_at_ratio_of_requests():
+    budget = RetryBudget(ratio=0.1, max_tokens=3)
+    while budget.withdraw('retry'):
+        pass
+
+    for _ in range(9):
+        budget.deposit()
+    assert not budget.withdraw('hedge')
+    budget.deposit()
+
+    assert budget.withdraw('hedge')
+    assert budget.stats()["spent"] == {"retry": 3, "hedge": 1}
+
+
+def test_retry_budget_is_capped():
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+    for _ in range(100):
+        budget.deposit()
+
+    assert budget.stats()["tokens"] == 2
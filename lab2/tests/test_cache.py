@@ -0,0 +1,259 @@
+"""
+Unit tests for the frontend cache (frontend-service)
+
+Run from lab2: python -m pytest tests
+"""
+import os
+import struct
+import subprocess
+import sys
+import time
+from threading import Event, Thread
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'frontend-service'))
+
+from cache import LRUPolicy, SegmentedCache, SharedCounters, SingleFlight, WTinyLFUPolicy
+
+
+def test_each_key_lives_in_one_segment():
+    cache = SegmentedCache(max_size=64, segments=4)
+    for n in range(20):
+        cache.put(f"info:{n}", n)
+
+    for n in range(20):
+        key = f"info:{n}"
+        holders = [segment for segment in cache.segments if segment.policy.peek(key) is not None]
+        assert holders == [cache.segment_for(key)]
+        assert cache.get(key) == n
+
+
+def test_capacity_is_split_across_segments():
+    cache = SegmentedCache(max_size=10, segments=4)
+    for n in range(100):
+        cache.put(f"info:{n}", n)
+
+    assert all(segment.capacity == 3 for segment in cache.segments)
+    assert all(len(segment.policy) <= 3 for segment in cache.segments)
+    assert cache.stats()["evictions"] == 100 - cache.stats()["size"]
+
+
+def test_update_and_invalidate():
+    cache = SegmentedCache(max_size=8, segments=2)
+    cache.put("info:1", "old")
+
+    cache.update("info:1", lambda current: (current + "+new", 0))
+    cache.update("info:2", lambda current: None)
+
+    assert cache.get("info:1") == "old+new"
+    assert cache.get("info:2") is None
+    assert cache.invalidate("info:1")
+    assert not cache.invalidate("info:1")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 1, 1)
+
+
+def test_lru_evicts_least_recently_used():
+    policy = LRUPolicy(2)
+    policy.put("a", 1)
+    policy.put("b", 2)
+    policy.get("a")
+
+    assert policy.put("c", 3) == ["b"]
+    assert policy.peek("a") == 1
+
+
+def test_wtinylfu_rejects_cold_keys_from_a_full_main_area():
+    policy = WTinyLFUPolicy(100)
+    for n in range(99):
+        policy.put(f"hot:{n}", n)
+    for _ in range(3):
+        for n in range(99):
+            policy.get(f"hot:{n}")
+
+    # A one-off scan passes through the window without displacing hot keys
+    for n in range(50):
+        policy.put(f"cold:{n}", n)
+
+    assert all(policy.peek(f"hot:{n}") is not None for n in range(99))
+    assert len(policy) == 100
+
+
+def test_wtinylfu_admits_keys_more_frequent_than_the_victim():
+    policy = WTinyLFUPolicy(100)
+    for n in range(99):
+        policy.put(f"old:{n}", n)
+    for _ in range(3):
+        policy.get("new")
+
+    evicted = policy.put("new", "value") + policy.put("next", "value")
+
+    assert policy.peek("new") == "value"
+    assert evicted == ["old:0"]
+
+
+def test_byte_bounded_cache_evicts_by_size():
+    cache = SegmentedCache(max_size=100, segments=1, max_bytes=1000)
+    cache.put("info:1", "a", size=400)
+    cache.put("info:2", "b", size=400)
+
+    assert cache.put("info:3", "c", size=400) == ["info:1"]
+    stats = cache.stats()
+    assert (stats["size"], stats["bytes_used"], stats["avg_entry_bytes"]) == (2, 800, 400.0)
+
+
+def test_byte_accounting_follows_replace_invalidate_and_eviction():
+    cache = SegmentedCache(max_size=100, segments=1, max_bytes=1000)
+    cache.put("info:1", "a", size=300)
+    cache.put("info:1", "a2", size=500)
+    cache.put("info:2", "b", size=200)
+    assert cache.stats()["bytes_used"] == 700
+
+    cache.invalidate("info:2")
+    assert cache.stats()["bytes_used"] == 500
+
+    cache.put("info:1", "a3", size=100)
+    assert cache.stats()["bytes_used"] == 100
+
+
+@pytest.mark.parametrize('policy', ['lru', 'wtinylfu'])
+def test_entry_larger_than_the_budget_is_rejected_alone(policy):
+    cache = SegmentedCache(max_size=100, segments=1, policy=policy, max_bytes=1000)
+    for n in range(5):
+        cache.put(f"info:{n}", n, size=100)
+
+    assert cache.put("search:big", "body", size=1200) == ["search:big"]
+    assert cache.get("search:big") is None
+    assert cache.stats()["size"] == 5
+    assert cache.stats()["bytes_used"] == 500
+
+
+@pytest.mark.parametrize('policy', ['lru', 'wtinylfu'])
+def test_cached_entry_growing_past_the_budget_is_dropped_alone(policy):
+    cache = SegmentedCache(max_size=100, segments=1, policy=policy, max_bytes=1000)
+    for n in range(5):
+        cache.put(f"info:{n}", n, size=100)
+        cache.get(f"info:{n}")
+
+    assert cache.put("info:0", "huge", size=1200) == ["info:0"]
+    assert cache.get("info:0") is None
+    assert cache.stats()["size"] == 4
+    assert cache.stats()["bytes_used"] == 400
+
+
+def test_count_bounded_cache_still_tracks_bytes():
+    cache = SegmentedCache(max_size=2, segments=1)
+    cache.put("info:1", "a", size=300)
+    cache.put("info:2", "b", size=200)
+    cache.put("info:3", "c", size=100)
+
+    assert cache.stats()["bytes_used"] == 300
+
+
+@pytest.mark.parametrize('policy', ['lru', 'wtinylfu'])
+def test_bytes_used_matches_cached_entries(policy):
+    cache = SegmentedCache(max_size=100, segments=2, policy=policy, max_bytes=2000)
+    for n in range(200):
+        key = f"info:{n % 37}"
+        cache.get(key)
+        cache.put(key, n, size=50 + n % 7 * 40)
+
+    for segment in cache.segments:
+        assert segment.bytes_used == sum(segment.sizes.values())
+        assert set(segment.sizes) == set(segment.policy.weights)
+        assert segment.bytes_used <= segment.capacity
+
+
+def test_singleflight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = Event()
+    release = Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "body"
+
+    results = []
+    leader = Thread(target=lambda: results.append(flight.do("info:1", fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [Thread(target=lambda: results.append(flight.do("info:1", fetch))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.coalesced < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["body"] * 5
+    assert len(calls) == 1
+    assert flight.calls == {}
+
+
+def test_singleflight_shares_the_error_and_forgets_the_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("catalog down")
+
+    with pytest.raises(ValueError):
+        flight.do("info:1", fail)
+    assert flight.do("info:1", lambda: "retried") == "retried"
+
+
+def test_background_call_is_not_started_twice():
+    flight = SingleFlight()
+    release = Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+
+    assert flight.do_in_background("info:1", refresh)
+    assert not flight.do_in_background("info:1", refresh)
+    release.set()
+    while flight.calls:
+        time.sleep(0.001)
+
+    assert len(calls) == 1
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_shared_counters_sum_every_worker(tmp_path):
+    path = str(tmp_path / 'stats')
+    first = SharedCounters(path, ['hits'], gauges=['size'])
+    second = SharedCounters(path, ['hits'], gauges=['size'])
+
+    first.add('hits', 2)
+    second.add('hits')
+    first.set('size', 10)
+    second.set('size', 5)
+
+    assert second.totals() == {"hits": 3, "size": 15, "workers": 2}
+
+
+def test_exited_worker_keeps_its_counts_but_not_its_gauges(tmp_path):
+    path = str(tmp_path / 'stats')
+    gone = SharedCounters(path, ['hits'], gauges=['size'], rows=2)
+    gone.add('hits', 4)
+    gone.set('size', 10)
+    struct.pack_into('Q', gone.map, gone.base, exited_pid())
+    SharedCounters(path, ['hits'], gauges=['size'], rows=2)
+
+    # Every row is taken, so the next worker reuses the exited one's row
+    replacement = SharedCounters(path, ['hits'], gauges=['size'], rows=2)
+    assert replacement.base == gone.base
+    replacement.add('hits')
+
+    assert replacement.totals() == {"hits": 5, "size": 0, "workers": 2}
@@ -0,0 +1,91 @@
+"""
+Unit tests for the catalog store and its write-ahead log (catalog-replica-1)
+
+Run from lab2: python -m pytest tests
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'catalog-replica-1'))
+
+import store
+from store import CatalogStore, WriteAheadLog
+
+BOOKS = [
+    {"id": 1, "title": "RPCs for Noobs", "topic": "distributed systems", "quantity": 5, "price": 50},
+    {"id": 2, "title": "Xen and the Art of Surviving Undergraduate School", "topic": "undergraduate school", "quantity": 3, "price": 20},
+]
+
+
+def make_store(tmp_path, books=BOOKS):
+    data_file = tmp_path / 'catalog.json'
+    if not data_file.exists():
+        data_file.write_text(json.dumps(books))
+    return CatalogStore(str(data_file), mode='wal')
+
+
+def write_wal(tmp_path, records, tail=b''):
+    with open(tmp_path / 'catalog.wal', 'wb') as f:
+        for record in records:
+            f.write(json.dumps(record).encode() + b'\n')
+        f.write(tail)
+
+
+def test_wal_drops_torn_tail(tmp_path):
+    write_wal(tmp_path, [{"seq": 1, "op": "decrement", "book_id": 1, "delta": -1}], tail=b'{"seq": 2, "op": "dec')
+    wal = WriteAheadLog(str(tmp_path / 'catalog.wal'))
+
+    records = wal.read()
+
+    assert [record["seq"] for record in records] == [1]
+    with open(tmp_path / 'catalog.wal', 'rb') as f:
+        assert f.read().endswith(b'}\n')
+
+
+def test_store_replays_wal_on_open(tmp_path):
+    catalog = make_store(tmp_path)
+    with catalog.write_lock:
+        catalog.mutate('decrement', 1, delta=-1)
+        seq = catalog.mutate('update_price', 2, price=25)
+    catalog.commit(seq)
+
+    reopened = make_store(tmp_path)
+
+    assert reopened.get(1)["quantity"] == 4
+    assert reopened.get(2)["price"] == 25
+    assert reopened.seq == 2
+
+
+def test_replay_skips_records_already_in_snapshot(tmp_path):
+    books = [dict(BOOKS[0], quantity=4, seq=1), BOOKS[1]]
+    write_wal(tmp_path, [{"seq": 1, "op": "decrement", "book_id": 1, "delta": -1}])
+
+    catalog = make_store(tmp_path, books)
+
+    assert catalog.get(1)["quantity"] == 4
+
+
+def test_compaction_rewrites_snapshot_and_empties_wal(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'WAL_COMPACT_EVERY', 2)
+    catalog = make_store(tmp_path)
+    with catalog.write_lock:
+        catalog.mutate('decrement', 1, delta=-1)
+        catalog.mutate('decrement', 1, delta=-1)
+
+    assert os.path.getsize(tmp_path / 'catalog.wal') == 0
+    snapshot = {book["id"]: book for book in json.loads((tmp_path / 'catalog.json').read_text())}
+    assert snapshot[1]["quantity"] == 3
+    assert make_store(tmp_path).get(1)["quantity"] == 3
+
+
+def test_replay_keeps_book_state_after_each_record(tmp_path):
+    catalog = make_store(tmp_path)
+    with catalog.write_lock:
+        catalog.mutate('decrement', 1, delta=-1)
+        seq = catalog.mutate('decrement', 1, delta=-1)
+    catalog.commit(seq)
+
+    reopened = make_store(tmp_path)
+
+    assert [(record["seq"], book["quantity"]) for record, book in reopened.replayed] == [(1, 4), (2, 3)]
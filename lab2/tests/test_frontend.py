@@ -0,0 +1,191 @@
+"""
+Unit tests for the frontend's read path (frontend-service)
+
+The catalog is replaced by a stub, so no other service needs to run.
+Run from lab2: python -m pytest tests
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'frontend-service'))
+os.environ.setdefault('CACHE_EPOCH_FILE', os.path.join(tempfile.mkdtemp(), 'cache-epochs'))
+
+import app as frontend
+from cache import SegmentedCache
+
+BOOK = {"title": "RPCs for Noobs", "quantity": 5, "price": 50, "version": 3}
+
+
+class StubResponse:
+    def __init__(self, status_code, data=None, etag=None):
+        self.status_code = status_code
+        self.content = json.dumps({"success": True, "data": data}).encode() if data is not None else b''
+        self.headers = {'ETag': etag} if etag else {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """Stub catalog: queue responses in `catalog.responses`, inspect `catalog.requests`."""
+    class Catalog:
+        responses = []
+        requests = []
+
+        @staticmethod
+        def get(path, headers=None):
+            Catalog.requests.append((path, headers))
+            return Catalog.responses.pop(0)
+
+    monkeypatch.setattr(frontend, 'catalog_get', Catalog.get)
+    monkeypatch.setattr(frontend, 'cache', SegmentedCache(100, 4))
+    return Catalog
+
+
+@pytest.fixture
+def client():
+    return frontend.app.test_client()
+
+
+def test_catalog_etag_is_passed_through_and_honoured(catalog, client):
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+
+    first = client.get('/info/1')
+    again = client.get('/info/1', headers={'If-None-Match': '"1-3"'})
+
+    assert first.status_code == 200
+    assert first.headers['ETag'] == '"1-3"'
+    assert again.status_code == 304
+    assert again.data == b''
+    assert len(catalog.requests) == 1
+
+
+def test_changed_etag_gets_the_full_body(catalog, client):
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+
+    response = client.get('/info/1', headers={'If-None-Match': '"1-2"'})
+
+    assert response.status_code == 200
+    assert response.get_json()["data"]["version"] == 3
+
+
+def test_body_hash_is_the_etag_when_catalog_sends_none(catalog, client):
+    catalog.responses.append(StubResponse(200, BOOK))
+
+    etag = client.get('/info/1').headers['ETag']
+
+    assert client.get('/info/1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_expired_entry_is_revalidated_with_if_none_match(catalog, client, monkeypatch):
+    monkeypatch.setattr(frontend, 'CACHE_STALE_WINDOW', 0)
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+    client.get('/info/1')
+    entry = frontend.cache.get('info:1')
+    frontend.put_in_cache('info:1', entry._replace(fetched_at=entry.fetched_at - 3600))
+    catalog.responses.append(StubResponse(304))
+
+    response = client.get('/info/1')
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == BOOK
+    assert catalog.requests[-1] == ('/info/1', {'If-None-Match': '"1-3"'})
+    assert frontend.entry_overdue('info:1', frontend.cache.get('info:1')) <= 0
+
+
+def cache_book(catalog, client, age):
+    """Cache BOOK as info:1 and make the entry `age` seconds old."""
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+    client.get('/info/1')
+    entry = frontend.cache.get('info:1')
+    frontend.put_in_cache('info:1', entry._replace(fetched_at=time.monotonic() - age))
+
+
+@pytest.fixture
+def ttl(monkeypatch):
+    monkeypatch.setattr(frontend, 'CACHE_TTLS', {'info': 30, 'search': 300})
+    monkeypatch.setattr(frontend, 'CACHE_STALE_WINDOW', 10)
+
+
+def test_fresh_entry_is_served_from_cache(ttl, catalog, client):
+    cache_book(catalog, client, age=29)
+
+    assert client.get('/info/1').status_code == 200
+    assert len(catalog.requests) == 1
+
+
+def test_entry_in_stale_window_is_served_and_refreshed_once(ttl, catalog, client, monkeypatch):
+    cache_book(catalog, client, age=35)
+    refreshes = []
+    monkeypatch.setattr(frontend.inflight, 'do_in_background', lambda key, fn: refreshes.append(key) or True)
+    served = frontend.shared_stats.totals()["stale_served"]
+
+    response = client.get('/info/1')
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == BOOK
+    assert len(catalog.requests) == 1
+    assert refreshes == ['info:1']
+    assert frontend.shared_stats.totals()["stale_served"] == served + 1
+
+
+def test_entry_past_stale_window_is_fetched_before_answering(ttl, catalog, client):
+    cache_book(catalog, client, age=41)
+    catalog.responses.append(StubResponse(200, dict(BOOK, version=4), etag='"1-4"'))
+
+    response = client.get('/info/1')
+
+    assert response.get_json()["data"]["version"] == 4
+    assert catalog.requests[-1] == ('/info/1', {'If-None-Match': '"1-3"'})
+
+
+def test_entry_changed_by_another_worker_is_not_served(ttl, catalog, client):
+    cache_book(catalog, client, age=0)
+    frontend.epochs.bump('info:1')
+    catalog.responses.append(StubResponse(304))
+
+    assert client.get('/info/1').status_code == 200
+    assert len(catalog.requests) == 2
+
+
+@pytest.mark.parametrize('update', [
+    {"book_id": 1, "data": BOOK},
+    {"book_id": 1, "etag": '"1-3"', "data": {"quantity": 5}},
+    {"book_id": 1, "etag": '"1-3"', "data": "not a dict"},
+    {"etag": '"1-3"', "data": BOOK},
+])
+def test_incomplete_cache_update_is_rejected(catalog, client, update):
+    response = client.post('/update-cache', json={"updates": [update]})
+
+    assert response.status_code == 400
+
+
+def test_cache_update_replaces_older_cached_info(catalog, client):
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+    client.get('/info/1')
+
+    response = client.post('/update-cache', json={
+        "updates": [{"book_id": 1, "etag": '"1-4"', "data": dict(BOOK, quantity=4, version=4)}]
+    })
+
+    assert response.get_json()["updated_keys"] == ["info:1"]
+    assert client.get('/info/1').get_json()["data"]["quantity"] == 4
+    assert len(catalog.requests) == 1
+
+
+def test_cache_stats_count_hits_and_misses(catalog, client):
+    before = client.get('/cache-stats').get_json()["data"]
+    catalog.responses.append(StubResponse(200, BOOK, etag='"1-3"'))
+
+    client.get('/info/1')
+    client.get('/info/1')
+
+    after = client.get('/cache-stats').get_json()["data"]
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+    assert after["workers"] == 1
@@ -0,0 +1,116 @@
+"""
+Unit tests for the order ledger (order-replica-1)
+
+Run from lab2: python -m pytest tests
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'order-replica-1'))
+
+import ledger
+from ledger import OrderLedger
+
+
+def open_ledger(tmp_path, **kwargs):
+    return OrderLedger(str(tmp_path / 'orders.jsonl'), **kwargs)
+
+
+def test_ids_are_reserved_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, 'ORDER_ID_BLOCK', 10)
+    orders = open_ledger(tmp_path)
+
+    ids = [orders.create(book_id=1)["order_id"] for _ in range(3)]
+
+    assert ids == [1, 2, 3]
+    assert (tmp_path / 'orders.counter').read_text() == '10'
+
+
+def test_ids_stay_monotonic_when_appends_are_lost(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, 'ORDER_ID_BLOCK', 10)
+    orders = open_ledger(tmp_path)
+    for _ in range(3):
+        orders.create(book_id=1)
+    orders.file.close()
+    # The appends never reached the disk, but the reservation did
+    (tmp_path / 'orders.jsonl').write_bytes(b'')
+
+    reopened = open_ledger(tmp_path)
+
+    assert reopened.create(book_id=1)["order_id"] == 11
+
+
+def test_reopen_rebuilds_index_and_drops_torn_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, 'ORDER_ID_BLOCK', 10)
+    orders = open_ledger(tmp_path)
+    first = orders.create(book_id=1, book_title="RPCs for Noobs")
+    orders.create(book_id=2)
+    orders.file.close()
+    with open(tmp_path / 'orders.jsonl', 'ab') as f:
+        f.write(b'{"order_id": 3, "book')
+
+    reopened = open_ledger(tmp_path)
+
+    assert reopened.last_id() == 2
+    assert reopened.get(first["order_id"]) == first
+    # Unused ids of the block reserved before the restart are skipped
+    assert reopened.create(book_id=3)["order_id"] == 11
+
+
+def test_replicated_orders_are_added_once(tmp_path):
+    orders = open_ledger(tmp_path)
+    replicated = [{"order_id": 5, "book_id": 1}, {"order_id": 6, "book_id": 2}]
+
+    assert orders.add_many(replicated) == 2
+    assert orders.add_many(replicated) == 0
+    assert [order["order_id"] for order in orders.page(after_id=5)] == [6]
+    assert orders.create(book_id=3)["order_id"] == 7
+
+
+def test_migrates_legacy_json_file(tmp_path):
+    legacy = tmp_path / 'orders.json'
+    legacy.write_text(json.dumps([{"order_id": 1, "book_id": 4}, {"order_id": 2, "book_id": 5}]))
+
+    orders = open_ledger(tmp_path, legacy_file=str(legacy))
+
+    assert [order["book_id"] for order in orders.all()] == [4, 5]
+    assert orders.create(book_id=6)["order_id"] == 3
+
+
+def test_partitions_create_odd_and_even_ids(tmp_path):
+    odd = OrderLedger(str(tmp_path / 'odd.jsonl'), partition=0, partitions=2)
+    even = OrderLedger(str(tmp_path / 'even.jsonl'), partition=1, partitions=2)
+
+    assert [odd.create(book_id=1)["order_id"] for _ in range(3)] == [1, 3, 5]
+    assert [even.create(book_id=1)["order_id"] for _ in range(3)] == [2, 4, 6]
+
+
+def test_partition_skips_past_replicated_ids(tmp_path):
+    odd = open_ledger(tmp_path, partition=0, partitions=2)
+    odd.create(book_id=1)
+    odd.add_many([{"order_id": 2, "book_id": 1}, {"order_id": 8, "book_id": 1}])
+
+    assert odd.create(book_id=1)["order_id"] == 9
+    assert odd.create(book_id=1)["order_id"] == 11
+
+
+def test_partition_ids_survive_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, 'ORDER_ID_BLOCK', 10)
+    even = open_ledger(tmp_path, partition=1, partitions=2)
+    even.create(book_id=1)
+    even.file.close()
+
+    reopened = open_ledger(tmp_path, partition=1, partitions=2)
+    order_id = reopened.create(book_id=1)["order_id"]
+
+    assert order_id % 2 == 0
+    assert order_id > 2
+
+
+def test_page_filters_by_partition(tmp_path):
+    orders = open_ledger(tmp_path, partition=0, partitions=2)
+    orders.add_many([{"order_id": n, "book_id": 1} for n in range(1, 11)])
+
+    assert [order["order_id"] for order in orders.page(after_id=2, limit=3, partition=1)] == [4, 6, 8]
+    assert [order["order_id"] for order in orders.page(after_id=7, partition=0)] == [9]
@@ -0,0 +1,146 @@
+"""
+Unit tests for the catalog replication queue (catalog-replica-1)
+
+Run from lab2: python -m pytest tests
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'catalog-replica-1'))
+
+import sync
+from sync import ReplicationQueue
+
+
+def open_queue(tmp_path):
+    return ReplicationQueue(str(tmp_path / 'replication.queue'))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_synced_entries_survive_a_restart(tmp_path):
+    queue = open_queue(tmp_path)
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+    queue.enqueue(2, 'update_price', 2, {"price": 25})
+    queue.sync(2)
+
+    reopened = open_queue(tmp_path)
+
+    assert [entry["seq"] for entry in reopened.pending] == [1, 2]
+    assert reopened.synced_seq == 2
+
+
+def test_transient_failures_are_retried(tmp_path, monkeypatch):
+    results = [(0, False), (0, False), (1, False)]
+    monkeypatch.setattr(sync, 'send_batch', lambda batch: results.pop(0))
+    monkeypatch.setattr(sync, 'RETRY_DELAY', 0.01)
+    queue = open_queue(tmp_path)
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+    queue.start()
+
+    wait_for(lambda: queue.acked_seq == 1)
+
+    assert results == []
+    assert queue.stats()["dead_lettered"] == 0
+
+
+def test_rejected_batch_is_dead_lettered_and_backup_resynced(tmp_path, monkeypatch):
+    resyncs = []
+    monkeypatch.setattr(sync, 'send_batch', lambda batch: (0, True))
+    monkeypatch.setattr(sync, 'request_resync', resyncs.append)
+    queue = open_queue(tmp_path)
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+    queue.enqueue(2, 'decrement', 1, {"quantity": 3})
+    queue.start()
+
+    wait_for(lambda: resyncs)
+
+    assert queue.acked_seq == 2
+    assert not queue.pending
+    with open(tmp_path / 'replication.queue.dead') as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2]
+    assert resyncs == [sync.PEER_URL]
+
+
+def test_write_waits_until_backup_applies_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync, 'send_batch', lambda batch: (len(batch), False))
+    queue = open_queue(tmp_path)
+    queue.start()
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+
+    assert queue.wait_acked(1, timeout=5)
+    assert queue.acked_seq == 1
+    assert not queue.lagging
+
+
+def test_slow_backup_stops_writes_waiting_until_it_catches_up(tmp_path, monkeypatch):
+    results = [(0, False)] * 3 + [(2, False)]
+    monkeypatch.setattr(sync, 'send_batch', lambda batch: results.pop(0))
+    monkeypatch.setattr(sync, 'RETRY_DELAY', 0.05)
+    queue = open_queue(tmp_path)
+    queue.start()
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+
+    assert queue.wait_acked(1, timeout=0.01)
+    assert queue.lagging
+    queue.enqueue(2, 'decrement', 1, {"quantity": 3})
+    started = time.monotonic()
+    assert queue.wait_acked(2, timeout=5)
+    assert time.monotonic() - started < 1
+
+    wait_for(lambda: not queue.lagging)
+    assert queue.acked_seq == 2
+
+
+def test_discarded_writes_are_saved_and_reported_lost(tmp_path):
+    queue = open_queue(tmp_path)
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+    queue.enqueue(2, 'update_price', 2, {"price": 25})
+
+    queue.discard()
+
+    assert not queue.wait_acked(2, timeout=5)
+    with open(tmp_path / 'replication.queue.discarded') as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2]
+    queue.enqueue(3, 'decrement', 1, {"quantity": 3})
+    assert queue.wait_acked(3, timeout=0.01)
+
+
+def test_new_term_orders_after_every_earlier_write():
+    term = 1 << sync.TERM_BITS
+
+    assert sync.term_start(1, 0, 0) == term
+    # The old primary's writes after its last report are still in its term
+    assert sync.term_start(2, term + 5, term + 100) == 2 * term
+    assert sync.term_start(2, term + 5, term + 100) > term + (term - 1)
+    # A restarted coordinator starts epochs at 1 again
+    assert sync.term_start(1, 3 * term + 7, 0) == 4 * term
+
+
+def test_writes_do_not_wait_for_the_backup_by_default(tmp_path, monkeypatch):
+    queue = open_queue(tmp_path)
+    monkeypatch.setattr(sync, 'replication_queue', queue)
+    monkeypatch.setattr(sync, 'REPLICATION_ACK_TIMEOUT', 0)
+    queue.enqueue(1, 'decrement', 1, {"quantity": 4})
+
+    assert sync.commit_write(1)
+    assert queue.acked_seq == 0
+    assert not queue.lagging
+
+
+def test_new_term_does_not_count_as_lag(tmp_path):
+    queue = open_queue(tmp_path)
+    term = 2 << sync.TERM_BITS
+
+    queue.begin_term(term)
+    queue.enqueue(term + 1, 'decrement', 1, {"quantity": 4})
+
+    assert queue.stats()["lag_seq"] == 1
+    assert open_queue(tmp_path).acked_seq == term